@@ -0,0 +1,178 @@
+import argparse
+import json
+import platform
+import random
+import statistics
+import sys
+import time
+import numpy as np
+from coverage_grid import CoverageGrid, coverage_uniformity
+from headless import spawn_flock, run_coverage, COVERAGE_RADIUS, K_WALL, MAX_ACCEL
+from boids_opt import (Boid, Obstacle, create_dense_cafeteria_obstacles, create_cafeteria_obstacles,
+                       create_narrow_corridor_obstacles, create_no_obstacles)
+from world import FlockWorld  # simulator/, on the import path through flock.py
+
+# Benchmarks for the flocking kernels, across flock sizes and maps.
+#
+#   python benchmark.py --output baseline.json            # run and save
+#   python benchmark.py --compare baseline.json           # run and flag regressions against a baseline
+#   python benchmark.py --sizes 100 500 --cases engine_step coverage_stamp
+#
+# Every result is keyed by (case, map, n) and reports the median and minimum seconds per call.
+
+SIZES = [50, 100, 500, 2000, 10000]
+MAPS = {
+    "empty": create_no_obstacles,
+    "cafeteria": create_cafeteria_obstacles,
+    "dense": create_dense_cafeteria_obstacles,
+    "narrow": create_narrow_corridor_obstacles,
+}
+GAINS = (0.2, 0.05, 0.3)
+REFERENCE_MAX_BOIDS = 500  # Boid.update is O(N^2) interpreted Python; beyond this one frame takes seconds
+SIMULATOR_MAX_BOIDS = 2000
+EVALUATE_STEPS = 600  # frames per timed evaluate run (10 simulated seconds)
+EVALUATE_MAX_BOIDS = 2000
+REGRESSION_THRESHOLD = 0.15  # flag cases more than 15% slower than the baseline
+
+
+def time_calls(fn, repeats):
+    times = []
+    for _ in range(repeats):
+        start = time.perf_counter()
+        fn()
+        times.append(time.perf_counter() - start)
+    return times
+
+
+def bench_engine_step(game_map, n, repeats):
+    flock = spawn_flock(game_map, n, 27)
+    return time_calls(lambda: flock.step(*GAINS, K_WALL, MAX_ACCEL), repeats)
+
+
+def bench_reference_update(game_map, n, repeats):
+    if n > REFERENCE_MAX_BOIDS:
+        return None
+    start = spawn_flock(game_map, n, 27)
+    boids = []
+    for (x, y), (vx, vy) in zip(start.positions.tolist(), start.velocities.tolist()):
+        boid = Boid()
+        boid.position.update(x, y)
+        boid.velocity.update(vx, vy)
+        boids.append(boid)
+    obstacles = [Obstacle((obs.position.x, obs.position.y), obs.size, obs.shape) for obs in game_map.records()]
+
+    def frame():
+        for boid in boids:
+            boid.update(boids, obstacles, *GAINS, K_WALL, MAX_ACCEL)
+    return time_calls(frame, max(1, repeats // 10))
+
+
+def bench_simulator_update(game_map, n, repeats):
+    if n > SIMULATOR_MAX_BOIDS or game_map.name != "no_obstacles":
+        return None  # the interactive simulator has its own obstacles, so it runs on the empty map only
+    random.seed(0)
+    np.random.seed(0)
+    world = FlockWorld(800, 600, n)
+    world.weights = {"cohesion": 1.0, "alignment": 1.0, "separation": 1.5}
+    return time_calls(world.step, max(1, repeats // 10))
+
+
+def bench_coverage_stamp(game_map, n, repeats):
+    flock = spawn_flock(game_map, n, 27)
+    coverage = CoverageGrid(game_map.free_mask, COVERAGE_RADIUS)
+    return time_calls(lambda: coverage.stamp(flock.positions), repeats)
+
+
+def bench_obstacle_forces(game_map, n, repeats):
+    flock = spawn_flock(game_map, n, 27)
+    return time_calls(flock.obstacle_forces, repeats)
+
+
+def bench_uniformity(game_map, n, repeats):
+    rng = np.random.default_rng(0)
+    heatmap = rng.integers(0, 200, size=game_map.free_mask.shape).astype(np.uint32)
+    return time_calls(lambda: coverage_uniformity(heatmap, game_map.free_mask), repeats)
+
+
+def bench_evaluate(game_map, n, repeats):
+    if n > EVALUATE_MAX_BOIDS:
+        return None
+    # run_coverage directly rather than evaluate_single_run, which would hit the result cache
+    return time_calls(lambda: run_coverage(game_map, GAINS, n, [27], EVALUATE_STEPS), max(1, repeats // 20))
+
+
+SIZE_INDEPENDENT = {"uniformity"}  # run once per map and reported with n=0
+CASES = {
+    "engine_step": bench_engine_step,
+    "reference_update": bench_reference_update,
+    "simulator_update": bench_simulator_update,
+    "coverage_stamp": bench_coverage_stamp,
+    "obstacle_forces": bench_obstacle_forces,
+    "uniformity": bench_uniformity,
+    "evaluate": bench_evaluate,
+}
+
+
+def run_benchmarks(cases, maps, sizes, repeats):
+    results = []
+    for map_name in maps:
+        game_map = MAPS[map_name]()
+        for n in sizes:
+            for case in cases:
+                if case in SIZE_INDEPENDENT and n != sizes[0]:
+                    continue
+                times = CASES[case](game_map, n, repeats)
+                if times is None:
+                    continue
+                key_n = 0 if case in SIZE_INDEPENDENT else n
+                results.append(dict(case=case, map=map_name, n=key_n, repeats=len(times),
+                                    median_s=statistics.median(times), min_s=min(times)))
+                print(f"{case:18s} {map_name:10s} n={key_n:<6d} median {results[-1]['median_s'] * 1e3:10.3f} ms")
+    return dict(
+        meta=dict(python=platform.python_version(), numpy=np.__version__, machine=platform.machine(),
+                  platform=platform.platform(), time=time.strftime("%Y-%m-%dT%H:%M:%S")),
+        results=results,
+    )
+
+
+def compare(report, baseline, threshold=REGRESSION_THRESHOLD):
+    """Print new vs baseline medians and return the (case, map, n) keys that got slower than threshold allows."""
+    base = {(r["case"], r["map"], r["n"]): r for r in baseline["results"]}
+    regressions = []
+    for r in report["results"]:
+        key = (r["case"], r["map"], r["n"])
+        if key not in base:
+            continue
+        ratio = r["median_s"] / base[key]["median_s"]
+        flag = ""
+        if ratio > 1 + threshold:
+            regressions.append(key)
+            flag = "REGRESSION"
+        elif ratio < 1 / (1 + threshold):
+            flag = "faster"
+        print(f"{r['case']:18s} {r['map']:10s} n={r['n']:<6d} "
+              f"{base[key]['median_s'] * 1e3:10.3f} -> {r['median_s'] * 1e3:10.3f} ms  x{ratio:5.2f} {flag}")
+    return regressions
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark the flocking kernels.")
+    parser.add_argument("--cases", nargs="+", choices=list(CASES), default=list(CASES))
+    parser.add_argument("--maps", nargs="+", choices=list(MAPS), default=list(MAPS))
+    parser.add_argument("--sizes", nargs="+", type=int, default=SIZES)
+    parser.add_argument("--repeats", type=int, default=20)
+    parser.add_argument("--output", help="write the results to this JSON file")
+    parser.add_argument("--compare", metavar="BASELINE", help="flag regressions against this JSON file")
+    parser.add_argument("--threshold", type=float, default=REGRESSION_THRESHOLD)
+    args = parser.parse_args()
+
+    report = run_benchmarks(args.cases, args.maps, args.sizes, args.repeats)
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(report, f, indent=2)
+    if args.compare:
+        with open(args.compare) as f:
+            regressions = compare(report, json.load(f), args.threshold)
+        if regressions:
+            print(f"{len(regressions)} regression(s) beyond {args.threshold:.0%}")
+            sys.exit(1)
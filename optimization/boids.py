@@ -3,20 +3,20 @@ import pygame_gui
 import random
 import math
 import time
+import numpy as np
 import matplotlib.pyplot as plt
-
-# params
-WIDTH, HEIGHT = 800, 600
-NUM_BOIDS = 100
-NEIGHBOR_RADIUS = 50
-AVOID_RADIUS = 20
-MAX_SPEED = 5
+from coverage_grid import free_space_mask, screen_to_free_percent
+from headless import run_coverage
+from headless import (WIDTH, HEIGHT, NUM_BOIDS, NEIGHBOR_RADIUS, AVOID_RADIUS, MAX_SPEED, FOV_ANGLE,
+                      SIM_STEPS, SEEDS)
+from trails import Trails
+from render import draw_flock, CoverageWindow
+from result_cache import cached_run_coverage
+
+# params, shared simulation settings come from headless.py
 TRAIL_LENGTH = 25
-FOV_ANGLE = 150  # degrees
 EPS = 1e-10
-SIM_DURATION = 60  # [s]
-COVERAGE_RADIUS = 2 # pixels
-SEEDS = [27, 729, 4913]
+RENDER_COVERAGE = True  # False runs coverage mode headless, without opening a window
 
 # gains
 k_coh = 0.21291127681588995
@@ -124,7 +124,6 @@ class Boid:
         self.position = pos
         angle = random.uniform(0, 2 * math.pi)
         self.velocity = pygame.Vector2(math.cos(angle), math.sin(angle)) * MAX_SPEED
-        self.trail = []
 
     def update(self, boids, obstacles):
         neighbors = []
@@ -201,24 +200,10 @@ class Boid:
             self.velocity.scale_to_length(MAX_SPEED)
 
         self.position += self.velocity
-        self.trail.append(self.position.copy())
-        if len(self.trail) > TRAIL_LENGTH:
-            self.trail.pop(0)
-
-    def draw(self, surface):
-        for i in range(1, len(self.trail)):
-            pygame.draw.line(surface, (100, 100, 255), self.trail[i-1], self.trail[i], 1)
-
-        direction = self.velocity.normalize()
-        point1 = self.position + direction * 10
-        point2 = self.position + direction.rotate(150) * 6
-        point3 = self.position + direction.rotate(-150) * 6
-        pygame.draw.polygon(surface, (255, 255, 255), [point1, point2, point3])
 
 def run_coverage_simulation():
     all_coverage = {}
     all_heatmaps = {}
-    total_pixels = WIDTH * HEIGHT
 
     print("Choose an environment:")
     print("1. Dense Cafeteria")
@@ -249,69 +234,22 @@ def run_coverage_simulation():
         env_name = "No Obstacles"
 
     def run_simulation(seed):
-        random.seed(seed)
-        pygame.init()
-        screen = pygame.display.set_mode((WIDTH, HEIGHT))
-        clock = pygame.time.Clock()
-        font = pygame.font.SysFont("consolas", 14)
-
-        boids = [Boid() for _ in range(NUM_BOIDS)]
-        visited_pixels = set()
-        pixel_frequency = [[0 for _ in range(WIDTH)] for _ in range(HEIGHT)]
-        coverage_over_time = []
-        last_recorded_second = -1
-        start_time = time.time()
-
-        running = True
-        while running:
-            screen.fill((30, 30, 30))
-            elapsed = time.time() - start_time
-
-            if elapsed >= SIM_DURATION:
-                break
-
-            for event in pygame.event.get():
-                if event.type == pygame.QUIT:
-                    running = False
-
-            for obs in obstacles:
-                obs.draw(screen)
-
-            for boid in boids:
-                boid.update(boids, obstacles)
-                boid.draw(screen)
-
-                for dx in range(-COVERAGE_RADIUS, COVERAGE_RADIUS + 1):
-                    for dy in range(-COVERAGE_RADIUS, COVERAGE_RADIUS + 1):
-                        if dx * dx + dy * dy <= COVERAGE_RADIUS * COVERAGE_RADIUS:
-                            px = int(boid.position.x) + dx
-                            py = int(boid.position.y) + dy
-                            if 0 <= px < WIDTH and 0 <= py < HEIGHT:
-                                point = pygame.Vector2(px, py)
-                                inside_obstacle = any(
-                                    ((point - obs.position).length() < obs.size if obs.shape == "circle"
-                                    else abs(point.x - obs.position.x) < obs.size and abs(point.y - obs.position.y) < obs.size)
-                                    for obs in obstacles)
-                                if not inside_obstacle:
-                                    visited_pixels.add((px, py))
-                                    pixel_frequency[py][px] += 1
-
-
-            current_second = int(elapsed)
-            if current_second != last_recorded_second:
-                coverage_over_time.append(len(visited_pixels))
-                last_recorded_second = current_second
-
-            screen.blit(font.render(f"Seed {seed} | Time: {elapsed:.1f}s", True, (200, 200, 200)), (WIDTH - 200, 10))
-            pygame.display.flip()
+        gains = (k_coh, k_ali, k_col)
+        if not RENDER_COVERAGE:
+            return cached_run_coverage(obstacles, gains, seed, NUM_BOIDS, SIM_STEPS, k_wall, MAX_ACCEL)
 
-        pygame.quit()
-        return [(v / total_pixels) * 100 for v in coverage_over_time], pixel_frequency
+        window = CoverageWindow(obstacles, NUM_BOIDS, TRAIL_LENGTH)
+        result = run_coverage(obstacles, gains, NUM_BOIDS, [seed], SIM_STEPS, k_wall, MAX_ACCEL, observer=window)[seed]
+        window.close()
+        return result
 
+    free_space = free_space_mask(obstacles, WIDTH, HEIGHT)
     for seed in SEEDS:
         print(f"Running coverage simulation for seed {seed}")
         coverage, freq_map = run_simulation(seed)
         all_coverage[seed] = coverage
+        print(f"Seed {seed}: final coverage {coverage[-1]:.2f}% of the screen, "
+              f"{screen_to_free_percent(coverage[-1], free_space):.2f}% of free space")
         all_heatmaps[seed] = freq_map
 
     plt.figure(figsize=(10, 5))
@@ -327,7 +265,7 @@ def run_coverage_simulation():
     plt.show()
 
     
-    global_max = max(max(max(row) for row in heatmap) for heatmap in all_heatmaps.values())
+    global_max = max(heatmap.max() for heatmap in all_heatmaps.values())
 
     fig, axs = plt.subplots(1, 3, figsize=(18, 6))
     for idx, seed in enumerate(SEEDS):
@@ -420,6 +358,7 @@ def run_slider_simulation():
         )
 
     boids = [Boid() for _ in range(NUM_BOIDS)]
+    trails = Trails(NUM_BOIDS, TRAIL_LENGTH)
     start_time = time.time()
     running = True
 
@@ -447,7 +386,9 @@ def run_slider_simulation():
 
         for boid in boids:
             boid.update(boids, obstacles)
-            boid.draw(screen)
+        positions = np.array([boid.position for boid in boids])
+        trails.push(positions)
+        draw_flock(screen, positions, np.array([boid.velocity for boid in boids]), trails.points())
 
 
         # HUD
@@ -3,21 +3,22 @@ import pygame_gui
 import random
 import math
 import time
+import numpy as np
 import matplotlib.pyplot as plt
 import pandas as pd
 import os, csv
-
-# params
-WIDTH, HEIGHT = 800, 600
-NEIGHBOR_RADIUS = 50
-AVOID_RADIUS = 20
-MAX_SPEED = 5
+from coverage_grid import free_space_mask, coverage_uniformity, screen_to_free_percent
+from headless import run_coverage
+from headless import (WIDTH, HEIGHT, NUM_BOIDS, NEIGHBOR_RADIUS, AVOID_RADIUS, MAX_SPEED, FOV_ANGLE,
+                      SIM_STEPS, SEEDS)
+from trails import Trails
+from render import draw_flock, CoverageWindow
+from shared_heatmaps import SharedHeatmaps, run_shared_heatmaps
+
+# params, shared simulation settings come from headless.py
 TRAIL_LENGTH = 0
-FOV_ANGLE = 150  # degrees
 EPS = 1e-10
-SIM_DURATION = 60  # [s]
-COVERAGE_RADIUS = 2 # pixels
-SEEDS = [27, 729, 4913]
+RENDER_COVERAGE = True  # False runs coverage mode headless, without opening a window
 
 # gains
 # k_coh = 0.21291127681588995
@@ -55,29 +56,9 @@ def find_max_average(filename):
     return k_coh, k_ali, k_col
 
 def compute_coverage_uniformity(heatmap, obstacles):
-    frequencies = []
-    for y in range(HEIGHT):
-        for x in range(WIDTH):
-            point = pygame.Vector2(x, y)
-            inside_obstacle = any(
-                ((point - obs.position).length() < obs.size if obs.shape == "circle"
-                else abs(point.x - obs.position.x) < obs.size and abs(point.y - obs.position.y) < obs.size)
-                for obs in obstacles)
-            if not inside_obstacle:
-                frequencies.append(heatmap[y][x])
-    
-    if not frequencies:
-        return None, None, None 
-
-    freq_array = pd.Series(frequencies)
-    variance = freq_array.var()
-    mean = freq_array.mean()
-    std_dev = freq_array.std()
+    return coverage_uniformity(heatmap, free_space_mask(obstacles, WIDTH, HEIGHT))
 
-    return variance, mean, std_dev
 
-
-NUM_BOIDS = 100
 k_coh, k_ali, k_col = find_max_average('boids/optimization/data/dense_100.csv')
 
 k_wall = 10
@@ -182,7 +163,6 @@ class Boid:
         self.position = pos
         angle = random.uniform(0, 2 * math.pi)
         self.velocity = pygame.Vector2(math.cos(angle), math.sin(angle)) * MAX_SPEED
-        self.trail = []
 
     def update(self, boids, obstacles):
         neighbors = []
@@ -259,24 +239,10 @@ class Boid:
             self.velocity.scale_to_length(MAX_SPEED)
 
         self.position += self.velocity
-        self.trail.append(self.position.copy())
-        if len(self.trail) > TRAIL_LENGTH:
-            self.trail.pop(0)
-
-    def draw(self, surface):
-        for i in range(1, len(self.trail)):
-            pygame.draw.line(surface, (100, 100, 255), self.trail[i-1], self.trail[i], 1)
-
-        direction = self.velocity.normalize()
-        point1 = self.position + direction * 10
-        point2 = self.position + direction.rotate(150) * 6
-        point3 = self.position + direction.rotate(-150) * 6
-        pygame.draw.polygon(surface, (255, 255, 255), [point1, point2, point3])
 
 def run_coverage_simulation():
     all_coverage = {}
     all_heatmaps = {}
-    total_pixels = WIDTH * HEIGHT
 
     print("Choose an environment:")
     print("1. Dense Cafeteria")
@@ -306,161 +272,126 @@ def run_coverage_simulation():
         create_no_obstacles(local_obstacles)
         env_name = "No Obstacles"
 
-    def run_simulation(seed):
-        random.seed(seed)
-        pygame.init()
-        screen = pygame.display.set_mode((WIDTH, HEIGHT))
-        clock = pygame.time.Clock()
-        font = pygame.font.SysFont("consolas", 14)
-
-        boids = [Boid() for _ in range(NUM_BOIDS)]
-        visited_pixels = set()
-        pixel_frequency = [[0 for _ in range(WIDTH)] for _ in range(HEIGHT)]
-        coverage_over_time = []
-        last_recorded_second = -1
-        start_time = time.time()
-
-        running = True
-        while running:
-            screen.fill((30, 30, 30))
-            elapsed = time.time() - start_time
-
-            if elapsed >= SIM_DURATION:
-                break
-
-            for event in pygame.event.get():
-                if event.type == pygame.QUIT:
-                    running = False
-
-            for obs in obstacles:
-                obs.draw(screen)
-
-            for boid in boids:
-                boid.update(boids, obstacles)
-                boid.draw(screen)
-
-                for dx in range(-COVERAGE_RADIUS, COVERAGE_RADIUS + 1):
-                    for dy in range(-COVERAGE_RADIUS, COVERAGE_RADIUS + 1):
-                        if dx * dx + dy * dy <= COVERAGE_RADIUS * COVERAGE_RADIUS:
-                            px = int(boid.position.x) + dx
-                            py = int(boid.position.y) + dy
-                            if 0 <= px < WIDTH and 0 <= py < HEIGHT:
-                                point = pygame.Vector2(px, py)
-                                inside_obstacle = any(
-                                    ((point - obs.position).length() < obs.size if obs.shape == "circle"
-                                    else abs(point.x - obs.position.x) < obs.size and abs(point.y - obs.position.y) < obs.size)
-                                    for obs in obstacles)
-                                if not inside_obstacle:
-                                    visited_pixels.add((px, py))
-                                    pixel_frequency[py][px] += 1
-
-
-            current_second = int(elapsed)
-            if current_second != last_recorded_second:
-                coverage_over_time.append(len(visited_pixels))
-                last_recorded_second = current_second
-
-            screen.blit(font.render(f"Seed {seed} | Time: {elapsed:.1f}s", True, (200, 200, 200)), (WIDTH - 200, 10))
-            pygame.display.flip()
-
-        pygame.quit()
-        return [(v / total_pixels) * 100 for v in coverage_over_time], pixel_frequency
-
-    uniformity_metrics = {}
-    for seed in SEEDS:
-        print(f"Running coverage simulation for seed {seed}")
-        coverage, freq_map = run_simulation(seed)
-        all_coverage[seed] = coverage
-        all_heatmaps[seed] = freq_map
-
-        variance, mean, std_dev = compute_coverage_uniformity(freq_map, obstacles)
-        print(f"Seed {seed}: Uniformity Metrics -> Variance: {variance:.2f}, Mean: {mean:.2f}, Std Dev: {std_dev:.2f}, CV: {std_dev/mean:.2f}")
-
-        uniformity_metrics[seed] = {
-        'variance': variance,
-        'mean': mean,
-        'std_dev': std_dev,
-        'normalized': std_dev / (mean + EPS) # idx
-        }
-
-    plt.figure(figsize=(10, 5))
-    for seed, percent in all_coverage.items():
-        plt.plot(range(len(percent)), percent, label=f"Seed {seed}")
-    plt.xlabel("Time [s]")
-    plt.ylabel("Screen Coverage [%]")
-    plt.title(f"Boid Coverage Over Time - {env_name}  ({NUM_BOIDS} boids)\nGains: k_coh={k_coh:.3f}, k_ali={k_ali:.3f}, k_col={k_col:.3f}")    
-    plt.ylim(0, 100)
-    plt.legend()
-    plt.grid(True, which='both')
-    plt.tight_layout()
-    plt.show()
+    gains = (k_coh, k_ali, k_col)
+    shared = None
+    try:
+        if not RENDER_COVERAGE:
+            # all seeds in parallel, each worker writing its heatmap straight into one shared block
+            shared = SharedHeatmaps(1, len(SEEDS), HEIGHT, WIDTH)
+            headless_coverage = run_shared_heatmaps(shared, [(obstacles, gains)], SEEDS, NUM_BOIDS, SIM_STEPS,
+                                                    k_wall, MAX_ACCEL)[0]
+
+        def run_simulation(seed):
+            if shared is not None:
+                return headless_coverage[seed], shared.array[0, SEEDS.index(seed)]
+
+            window = CoverageWindow(obstacles, NUM_BOIDS, TRAIL_LENGTH)
+            result = run_coverage(obstacles, gains, NUM_BOIDS, [seed], SIM_STEPS, k_wall, MAX_ACCEL, observer=window)[seed]
+            window.close()
+            return result
+
+        uniformity_metrics = {}
+        free_space = free_space_mask(obstacles, WIDTH, HEIGHT)
+        for seed in SEEDS:
+            print(f"Running coverage simulation for seed {seed}")
+            coverage, freq_map = run_simulation(seed)
+            all_coverage[seed] = coverage
+            print(f"Seed {seed}: final coverage {coverage[-1]:.2f}% of the screen, "
+                  f"{screen_to_free_percent(coverage[-1], free_space):.2f}% of free space")
+            all_heatmaps[seed] = freq_map
+
+            variance, mean, std_dev = compute_coverage_uniformity(freq_map, obstacles)
+            print(f"Seed {seed}: Uniformity Metrics -> Variance: {variance:.2f}, Mean: {mean:.2f}, Std Dev: {std_dev:.2f}, CV: {std_dev/mean:.2f}")
+
+            uniformity_metrics[seed] = {
+            'variance': variance,
+            'mean': mean,
+            'std_dev': std_dev,
+            'normalized': std_dev / (mean + EPS) # idx
+            }
+
+        plt.figure(figsize=(10, 5))
+        for seed, percent in all_coverage.items():
+            plt.plot(range(len(percent)), percent, label=f"Seed {seed}")
+        plt.xlabel("Time [s]")
+        plt.ylabel("Screen Coverage [%]")
+        plt.title(f"Boid Coverage Over Time - {env_name}  ({NUM_BOIDS} boids)\nGains: k_coh={k_coh:.3f}, k_ali={k_ali:.3f}, k_col={k_col:.3f}")    
+        plt.ylim(0, 100)
+        plt.legend()
+        plt.grid(True, which='both')
+        plt.tight_layout()
+        plt.show()
 
     
-    global_max = max(max(max(row) for row in heatmap) for heatmap in all_heatmaps.values())
+        global_max = max(heatmap.max() for heatmap in all_heatmaps.values())
 
-    fig, axs = plt.subplots(1, 3, figsize=(18, 6))
-    for idx, seed in enumerate(SEEDS):
-        ax = axs[idx]
-        heatmap = all_heatmaps[seed]
+        fig, axs = plt.subplots(1, 3, figsize=(18, 6))
+        for idx, seed in enumerate(SEEDS):
+            ax = axs[idx]
+            heatmap = all_heatmaps[seed]
         
-        im = ax.imshow(heatmap, cmap='hot', interpolation='nearest', vmin=0, vmax=global_max)
-        ax.set_title(f"Seed {seed} Coverage Heatmap")
-        ax.axis('off')
+            im = ax.imshow(heatmap, cmap='hot', interpolation='nearest', vmin=0, vmax=global_max)
+            ax.set_title(f"Seed {seed} Coverage Heatmap")
+            ax.axis('off')
+
+            for obs in obstacles:
+                if obs.shape == "circle":
+                    circle = plt.Circle((obs.position.x, obs.position.y), obs.size, color='blue', fill=False, linewidth=2)
+                    ax.add_patch(circle)
+                elif obs.shape == "square":
+                    rect = plt.Rectangle((obs.position.x - obs.size, obs.position.y - obs.size),
+                                        2 * obs.size, 2 * obs.size,
+                                        edgecolor='blue', facecolor='none', linewidth=2)
+                    ax.add_patch(rect)
+                elif obs.shape == "rectangle":
+                    rect = plt.Rectangle((obs.position.x - obs.width // 2, obs.position.y - obs.height // 2),
+                                        obs.width, obs.height,
+                                        edgecolor='blue', facecolor='none', linewidth=2)
+                    ax.add_patch(rect)
 
-        for obs in obstacles:
-            if obs.shape == "circle":
-                circle = plt.Circle((obs.position.x, obs.position.y), obs.size, color='blue', fill=False, linewidth=2)
-                ax.add_patch(circle)
-            elif obs.shape == "square":
-                rect = plt.Rectangle((obs.position.x - obs.size, obs.position.y - obs.size),
-                                    2 * obs.size, 2 * obs.size,
-                                    edgecolor='blue', facecolor='none', linewidth=2)
-                ax.add_patch(rect)
-            elif obs.shape == "rectangle":
-                rect = plt.Rectangle((obs.position.x - obs.width // 2, obs.position.y - obs.height // 2),
-                                    obs.width, obs.height,
-                                    edgecolor='blue', facecolor='none', linewidth=2)
-                ax.add_patch(rect)
-
-        metrics = uniformity_metrics[seed]
-        uniformity_text = (
-            f"Var: {metrics['variance']:.1f}\n"
-            f"Mean: {metrics['mean']:.1f}\n"
-            f"Std: {metrics['std_dev']:.1f}\n"
-            f"CV: {metrics['normalized']:.2f}"
-        )
-        ax.text(5, 5, uniformity_text, color='white', fontsize=10,
-                bbox=dict(facecolor='black', alpha=0.5), verticalalignment='top')
-
-        cbar = fig.colorbar(im, ax=ax, fraction=0.046, pad=0.04)
-        cbar.set_label('Visit Frequency', rotation=270, labelpad=15)
-
-    fig.suptitle(f"Boid Coverage Heatmaps - {env_name}  ({NUM_BOIDS} boids)")
-    plt.tight_layout()
-    plt.show()
-
-    output_file = 'uniformity_log.csv'
-    write_header = not os.path.exists(output_file)
-
-    with open(output_file, 'a', newline='') as csvfile:
-        writer = csv.writer(csvfile)
-        if write_header:
-            writer.writerow([
-                'environment', 'num_boids', 'seed',
-                'variance', 'mean', 'std_dev', 'normalized'
-            ])
-        
-        for seed in SEEDS:
             metrics = uniformity_metrics[seed]
-            writer.writerow([
-                env_name,
-                NUM_BOIDS,
-                seed,
-                round(metrics['variance'], 4),
-                round(metrics['mean'], 4),
-                round(metrics['std_dev'], 4),
-                round(metrics['normalized'], 4)
-            ])
+            uniformity_text = (
+                f"Var: {metrics['variance']:.1f}\n"
+                f"Mean: {metrics['mean']:.1f}\n"
+                f"Std: {metrics['std_dev']:.1f}\n"
+                f"CV: {metrics['normalized']:.2f}"
+            )
+            ax.text(5, 5, uniformity_text, color='white', fontsize=10,
+                    bbox=dict(facecolor='black', alpha=0.5), verticalalignment='top')
+
+            cbar = fig.colorbar(im, ax=ax, fraction=0.046, pad=0.04)
+            cbar.set_label('Visit Frequency', rotation=270, labelpad=15)
+
+        fig.suptitle(f"Boid Coverage Heatmaps - {env_name}  ({NUM_BOIDS} boids)")
+        plt.tight_layout()
+        plt.show()
+
+        output_file = 'uniformity_log.csv'
+        write_header = not os.path.exists(output_file)
+
+        with open(output_file, 'a', newline='') as csvfile:
+            writer = csv.writer(csvfile)
+            if write_header:
+                writer.writerow([
+                    'environment', 'num_boids', 'seed',
+                    'variance', 'mean', 'std_dev', 'normalized'
+                ])
+        
+            for seed in SEEDS:
+                metrics = uniformity_metrics[seed]
+                writer.writerow([
+                    env_name,
+                    NUM_BOIDS,
+                    seed,
+                    round(metrics['variance'], 4),
+                    round(metrics['mean'], 4),
+                    round(metrics['std_dev'], 4),
+                    round(metrics['normalized'], 4)
+                ])
+    finally:
+        # free the shared block even when plotting, writing results or a Ctrl-C cuts the run short
+        if shared is not None:
+            shared.release()
 
 # sliders
 def run_slider_simulation():
@@ -516,6 +447,7 @@ def run_slider_simulation():
         )
 
     boids = [Boid() for _ in range(NUM_BOIDS)]
+    trails = Trails(NUM_BOIDS, TRAIL_LENGTH)
     start_time = time.time()
     running = True
 
@@ -543,7 +475,9 @@ def run_slider_simulation():
 
         for boid in boids:
             boid.update(boids, obstacles)
-            boid.draw(screen)
+        positions = np.array([boid.position for boid in boids])
+        trails.push(positions)
+        draw_flock(screen, positions, np.array([boid.velocity for boid in boids]), trails.points())
 
 
         # HUD
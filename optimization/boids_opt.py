@@ -1,30 +1,33 @@
 import pygame
 import random
 import math
-import time
 import multiprocessing
 from tqdm import tqdm
 import csv
-from collections import defaultdict
-
-# params
-WIDTH, HEIGHT = 800, 600
-NUM_BOIDS = 100
-NEIGHBOR_RADIUS = 50
-AVOID_RADIUS = 20
-MAX_SPEED = 5
+from collections import deque
+import numpy as np
+from headless import run_ensemble_coverage, run_pruned_ensemble_coverage
+from headless import (WIDTH, HEIGHT, NUM_BOIDS, NEIGHBOR_RADIUS, AVOID_RADIUS, MAX_SPEED, FOV_ANGLE,
+                      SIM_STEPS, SEEDS)
+from result_cache import cached_run_coverage
+from search import OPTIMIZERS, optimize
+from pruning import PRUNERS
+from results_log import ResultLog, result_key, aggregate
+from maps import Map
+
+# params, shared simulation settings come from headless.py
 TRAIL_LENGTH = 0
-FOV_ANGLE = 150
 EPS = 1e-10
-SIM_DURATION = 60  # seconds
-COVERAGE_RADIUS = 2
-SEEDS = [27, 729, 4913]
 
 # optimization config
 NUM_OPTIMIZATION_ITERATIONS = 2000
 MAX_K_COH = 0.5
 MAX_K_ALI = 0.1
 MAX_K_COL = 0.5
+ENSEMBLE_SIZE = 16  # gain vectors stepped together as one FlockEnsemble per pool job
+GAIN_BOUNDS = [(0.0, MAX_K_COH), (0.0, MAX_K_ALI), (0.0, MAX_K_COL)]
+MAX_SIMULATIONS = 600  # full-length runs (gain vector x seed) an optimizer may spend
+PATIENCE = 15  # rounds without improvement before an optimizer gives up
 
 class Obstacle:
     def __init__(self, position, size, shape="circle"):
@@ -62,13 +65,13 @@ def create_dense_cafeteria_obstacles():
         num_chairs = random.randint(4, 8)  # Random number of chairs
         create_table_with_chairs(center, table_radius=30, num_chairs=num_chairs, chair_size=8, chair_distance=45, obs=obs)
 
-    return obs
+    return Map.from_obstacles("dense_cafeteria", obs, WIDTH, HEIGHT)
 
 def create_cafeteria_obstacles():
     obs = []
     create_table_with_chairs((200, 200), 40, 8, 10, 60, obs)
     create_table_with_chairs((600, 400), 30, 8, 10, 50, obs)
-    return obs
+    return Map.from_obstacles("cafeteria", obs, WIDTH, HEIGHT)
 
 def create_narrow_corridor_obstacles():
     obs = []
@@ -87,10 +90,10 @@ def create_narrow_corridor_obstacles():
 
     obs.append(top)
     obs.append(bottom)
-    return obs
+    return Map.from_obstacles("narrow_corridor", obs, WIDTH, HEIGHT)
 
 def create_no_obstacles():
-    return []
+    return Map.from_obstacles("no_obstacles", [], WIDTH, HEIGHT)
 
 
 class Boid:
@@ -99,7 +102,6 @@ class Boid:
         self.position = pygame.Vector2(self.rng.uniform(50, WIDTH - 50), self.rng.uniform(50, HEIGHT - 50))
         angle = self.rng.uniform(0, 2 * math.pi)
         self.velocity = pygame.Vector2(math.cos(angle), math.sin(angle)) * MAX_SPEED
-        self.trail = []
 
     def update(self, boids, obstacles, k_coh, k_ali, k_col, k_wall, MAX_ACCEL):
         neighbors = []
@@ -163,51 +165,50 @@ class Boid:
             self.velocity.scale_to_length(MAX_SPEED)
         self.position += self.velocity
 
+# the map every pool worker simulates on, installed once per worker by load_worker_map so
+# jobs only carry gains, seeds and sizes
+worker_map = None
+
+def load_worker_map(game_map):
+    global worker_map
+    worker_map = game_map
+
 def evaluate_single_run(args):
-    gain_vector, seed, local_obstacles = args
-    k_coh, k_ali, k_col = gain_vector
-    k_wall = 10
-    MAX_ACCEL = 0.5
-    total_pixels = WIDTH * HEIGHT
-
-    rng = random.Random(seed)
-    boids = []
-    while len(boids) < NUM_BOIDS:
-        pos = pygame.Vector2(rng.uniform(50, WIDTH - 50), rng.uniform(50, HEIGHT - 50))
-        inside = any(
-            ((pos - obs.position).length() < obs.size if obs.shape == "circle"
-             else abs(pos.x - obs.position.x) < obs.size and abs(pos.y - obs.position.y) < obs.size)
-            for obs in local_obstacles)
-        if not inside:
-            boid = Boid(rng=rng)
-            boid.position = pos
-            angle = rng.uniform(0, 2 * math.pi)
-            boid.velocity = pygame.Vector2(math.cos(angle), math.sin(angle)) * MAX_SPEED
-            boids.append(boid)
-
-    visited_pixels = set()
-    start_time = time.time()
-    while time.time() - start_time < SIM_DURATION:
-        for boid in boids:
-            boid.update(boids, local_obstacles, k_coh, k_ali, k_col, k_wall, MAX_ACCEL)
-            for dx in range(-COVERAGE_RADIUS, COVERAGE_RADIUS + 1):
-                for dy in range(-COVERAGE_RADIUS, COVERAGE_RADIUS + 1):
-                    if dx*dx + dy*dy <= COVERAGE_RADIUS * COVERAGE_RADIUS:
-                        cx = int(boid.position.x) + dx
-                        cy = int(boid.position.y) + dy
-                        if 0 <= cx < WIDTH and 0 <= cy < HEIGHT:
-                            point = pygame.Vector2(cx, cy)
-                            inside = any(
-                                ((point - obs.position).length() < obs.size if obs.shape == "circle"
-                                 else abs(point.x - obs.position.x) < obs.size and abs(point.y - obs.position.y) < obs.size)
-                                for obs in local_obstacles)
-                            if not inside:
-                                visited_pixels.add((cx, cy))
-
-    final_coverage = len(visited_pixels) / total_pixels * 100
-    return (tuple(gain_vector), seed, final_coverage)
-
-def run_random_search_optimization(num_vectors=NUM_OPTIMIZATION_ITERATIONS):
+    gain_vector, seed, num_boids, steps = args
+    coverage_over_time, _ = cached_run_coverage(worker_map, gain_vector, seed, num_boids, steps)
+    return (tuple(gain_vector), seed, float(coverage_over_time[-1]))
+
+def evaluate_gain_batch(args):
+    gain_vectors, seeds, num_boids, steps = args
+    coverage, _ = run_ensemble_coverage(worker_map, gain_vectors, seeds, num_boids, steps)
+    return [(tuple(gv), seed, float(coverage[g, s]))
+            for g, gv in enumerate(gain_vectors) for s, seed in enumerate(seeds)]
+
+def evaluate_pruned_batch(args):
+    gain_vectors, seeds, num_boids, steps, pruner = args
+    coverage, stopped_at, curves = run_pruned_ensemble_coverage(worker_map, gain_vectors, pruner,
+                                                                seeds, num_boids, steps)
+    results = [(tuple(gv), seed, float(coverage[g, s]))
+               for g, gv in enumerate(gain_vectors) for s, seed in enumerate(seeds)]
+    return results, {tuple(gv): int(stopped_at[g]) for g, gv in enumerate(gain_vectors)}, curves
+
+def run_pruned_batches(pool, jobs, pruner, in_flight):
+    """Yield (results, stopped_at) per pruned batch, with at most in_flight jobs queued, each sent the pruner history so far."""
+    pending = deque()
+    jobs = iter(jobs)
+    while True:
+        while len(pending) < in_flight:
+            job = next(jobs, None)
+            if job is None:
+                break
+            pending.append(pool.apply_async(evaluate_pruned_batch, ((*job, pruner),)))
+        if not pending:
+            return
+        batch_results, batch_stops, curves = pending.popleft().get()
+        pruner.record(curves)
+        yield batch_results, batch_stops
+
+def choose_environment():
     print("Choose environment for optimization:")
     print("1. Dense Cafeteria")
     print("2. Cafeteria")
@@ -216,53 +217,124 @@ def run_random_search_optimization(num_vectors=NUM_OPTIMIZATION_ITERATIONS):
     choice = input("Enter your choice (1/2/3/4): ").strip()
 
     if choice == "1":
-        env_name = "Dense Cafeteria"
-        environment_obstacles = create_dense_cafeteria_obstacles()
+        return "Dense Cafeteria", create_dense_cafeteria_obstacles()
     elif choice == "2":
-        env_name = "Cafeteria"
-        environment_obstacles = create_cafeteria_obstacles()
+        return "Cafeteria", create_cafeteria_obstacles()
     elif choice == "3":
-        env_name = "Narrow Corridor"
-        environment_obstacles = create_narrow_corridor_obstacles()
+        return "Narrow Corridor", create_narrow_corridor_obstacles()
     else:
-        env_name = "No Obstacles"
-        environment_obstacles = create_no_obstacles()
-
+        return "No Obstacles", create_no_obstacles()
+
+def draw_gain_vectors(search_seed, num_vectors):
+    """The random search's candidates: num_vectors gain vectors drawn uniformly within the bounds from search_seed."""
+    rng = random.Random(search_seed)
+    return [(rng.uniform(0.0, MAX_K_COH),
+             rng.uniform(0.0, MAX_K_ALI),
+             rng.uniform(0.0, MAX_K_COL))
+            for _ in range(num_vectors)]
+
+def pending_gain_vectors(log, file_env, search_seed, num_vectors):
+    """The search's gain vectors that still miss a logged result for some seed."""
+    done = log.completed_keys()
+    return [gv for gv in draw_gain_vectors(search_seed, num_vectors)
+            if any(result_key(file_env, NUM_BOIDS, SIM_STEPS, gv, seed) not in done for seed in SEEDS)]
+
+def choose_search_seed(log, file_env, num_vectors):
+    """Seed of the last search logged for this map if it is unfinished, so a restart resumes it; otherwise a fresh one."""
+    last = None
+    for row in log.rows():
+        if (row["map"], row["num_boids"], row["steps"]) == (file_env, NUM_BOIDS, SIM_STEPS):
+            last = row["search_seed"]
+    if last is not None and pending_gain_vectors(log, file_env, last, num_vectors):
+        return last
+    return random.SystemRandom().randrange(2 ** 31)
+
+def run_random_search_optimization(num_vectors=NUM_OPTIMIZATION_ITERATIONS, pruning=None, search_seed=None):
+    env_name, game_map = choose_environment()
+    file_env = env_name.replace(' ', '_').lower()
+
+    # the seed goes into the log with every result, so a restarted run redraws the same candidates and
+    # skips the ones already logged, while a search started after the last one finished draws new ones
+    log = ResultLog(f"random_search_log_{file_env}.csv")
+    if search_seed is None:
+        search_seed = choose_search_seed(log, file_env, num_vectors)
+    gain_vectors = pending_gain_vectors(log, file_env, search_seed, num_vectors)
+    print(f"Search seed {search_seed}")
+    if len(gain_vectors) < num_vectors:
+        print(f"Resuming: {num_vectors - len(gain_vectors)} of {num_vectors} gain vectors already logged")
+
+    batches = [gain_vectors[i:i + ENSEMBLE_SIZE] for i in range(0, len(gain_vectors), ENSEMBLE_SIZE)]
+    jobs = [(batch, SEEDS, NUM_BOIDS, SIM_STEPS) for batch in batches]
+
+    with multiprocessing.Pool(initializer=load_worker_map, initargs=(game_map,)) as pool:
+        if pruning is None:
+            finished = ((batch_results, {}) for batch_results in pool.imap_unordered(evaluate_gain_batch, jobs))
+        else:
+            # later jobs prune against everything finished before they were submitted, so keep
+            # only a couple of jobs per worker queued
+            finished = run_pruned_batches(pool, jobs, PRUNERS[pruning](SIM_STEPS),
+                                          in_flight=2 * (multiprocessing.cpu_count() or 1))
+        for batch_results, batch_stops in tqdm(finished, total=len(jobs)):
+            log.append(file_env, NUM_BOIDS, SIM_STEPS, batch_results, search_seed, batch_stops)
+
+    aggregate_random_search(env_name)
+
+def aggregate_random_search(env_name):
+    """Average the random search log for env_name into random_search_results_<env>.csv."""
+    file_env = env_name.replace(' ', '_').lower()
+    best, best_cov, num_full, num_pruned = aggregate(
+        ResultLog(f"random_search_log_{file_env}.csv"), file_env, NUM_BOIDS, SIM_STEPS, SEEDS,
+        f"random_search_results_{file_env}.csv", f"random_search_pruned_{file_env}.csv")
+    if num_pruned:
+        # coverage of pruned vectors is at their stop point, so they are kept out of the main results
+        print(f"Pruned {num_pruned} of {num_full + num_pruned} gain vectors early")
+    print("Best Gain Vector:", best, "with", f"{best_cov:.2f}%", "coverage")
 
-    gain_vectors = [[random.uniform(0.0, MAX_K_COH),
-                     random.uniform(0.0, MAX_K_ALI),
-                     random.uniform(0.0, MAX_K_COL)]
-                    for _ in range(num_vectors)]
+def make_objective(pool):
+    """Average coverage over SEEDS via evaluate_single_run, with the cost counted in full-length runs.
 
-    jobs = [(gv, seed, environment_obstacles) for gv in gain_vectors for seed in SEEDS]
+    The pool's workers must have their map loaded with load_worker_map.
+    """
+    def objective(gain_vectors, fraction=1.0):
+        steps = max(1, round(SIM_STEPS * fraction))
+        jobs = [(tuple(gv), seed, NUM_BOIDS, steps) for gv in gain_vectors for seed in SEEDS]
+        results = pool.map(evaluate_single_run, jobs)
+        coverage = np.array([cov for _, _, cov in results]).reshape(len(gain_vectors), len(SEEDS))
+        return coverage.mean(axis=1), len(jobs) * steps / SIM_STEPS
+    return objective
 
-    with multiprocessing.Pool() as pool:
-        results = list(tqdm(pool.imap_unordered(evaluate_single_run, jobs), total=len(jobs)))
+def run_optimizer_search(method, max_simulations=MAX_SIMULATIONS, patience=PATIENCE):
+    env_name, game_map = choose_environment()
+    optimizer = OPTIMIZERS[method](GAIN_BOUNDS)
 
-    grouped = defaultdict(list)
-    for gvec, seed, cov in results:
-        grouped[gvec].append((seed, cov))
+    with multiprocessing.Pool(initializer=load_worker_map, initargs=(game_map,)) as pool:
+        best, best_cov, history = optimize(optimizer, make_objective(pool), max_simulations, patience)
 
-    with open(f"random_search_results_{env_name.replace(' ', '_').lower()}.csv", "w", newline="") as f:
+    # best coverage found against simulations spent, for comparing optimizers on equal budgets
+    with open(f"{method}_search_history_{env_name.replace(' ', '_').lower()}.csv", "w", newline="") as f:
         writer = csv.writer(f)
-        writer.writerow([
-            "k_coh", "k_ali", "k_col",
-            "coverage_seed_27", "coverage_seed_729", "coverage_seed_4913",
-            "average"
-        ])
-
-        best = None
-        best_cov = -1
-        for gvec, seed_cov_pairs in grouped.items():
-            seed_to_cov = {seed: cov for seed, cov in seed_cov_pairs}
-            cov_list = [seed_to_cov.get(seed, 0) for seed in sorted(SEEDS)]
-            avg_cov = sum(cov_list) / len(cov_list)
-            writer.writerow([*gvec, *cov_list, avg_cov])
-            if avg_cov > best_cov:
-                best_cov = avg_cov
-                best = gvec
+        writer.writerow(["simulations", "best_average", "k_coh", "k_ali", "k_col"])
+        for used, score, gvec in history:
+            if gvec is not None:
+                writer.writerow([f"{used:g}", score, *gvec])
 
+    print(f"{method}: {history[-1][0]:g} simulations used")
     print("Best Gain Vector:", best, "with", f"{best_cov:.2f}%", "coverage")
 
 if __name__ == "__main__":
-    run_random_search_optimization()
+    methods = list(OPTIMIZERS)
+    print("Choose optimizer:")
+    print("1. Random search (resumable, logs every run and writes the averaged results CSV)")
+    for i, method in enumerate(methods, start=2):
+        print(f"{i}. {method}")
+    print(f"{len(methods) + 2}. Aggregate an existing random search log into the results CSV")
+    choice = input(f"Enter your choice (1-{len(methods) + 2}): ").strip()
+    if choice.isdigit() and 2 <= int(choice) <= len(methods) + 1:
+        run_optimizer_search(methods[int(choice) - 2])
+    elif choice == str(len(methods) + 2):
+        aggregate_random_search(choose_environment()[0])
+    else:
+        pruning = input(f"Prune bad gain vectors early? (none/{'/'.join(PRUNERS)}): ").strip().lower()
+        search_seed = input("Search seed (blank resumes an unfinished search or starts a new one): ").strip()
+        run_random_search_optimization(pruning=pruning if pruning in PRUNERS else None,
+                                       search_seed=int(search_seed) if search_seed.isdigit() else None)
@@ -0,0 +1,172 @@
+import numpy as np
+
+
+def free_space_mask(obstacles, width, height):
+    """Rasterize obstacles once into a (height, width) bool mask that is True on free pixels.
+
+    Uses the same inside test as the coverage loops: strictly inside the radius for circles,
+    and within `size` of the center on both axes for every other shape (rectangles included).
+    The mask's sum is the denominator for free-space coverage.
+    """
+    free = np.ones((height, width), dtype=bool)
+    for obs in obstacles:
+        cx, cy, size = obs.position.x, obs.position.y, obs.size
+        # only touch the obstacle's bounding box
+        x0, x1 = max(int(np.floor(cx - size)), 0), min(int(np.ceil(cx + size)) + 1, width)
+        y0, y1 = max(int(np.floor(cy - size)), 0), min(int(np.ceil(cy + size)) + 1, height)
+        if x0 >= x1 or y0 >= y1:
+            continue
+        dx = np.arange(x0, x1, dtype=float)[None, :] - cx
+        dy = np.arange(y0, y1, dtype=float)[:, None] - cy
+        if obs.shape == "circle":
+            inside = np.sqrt(dx * dx + dy * dy) < size
+        else:
+            inside = (np.abs(dx) < size) & (np.abs(dy) < size)
+        free[y0:y1, x0:x1] &= ~inside
+    return free
+
+
+def disk_stencil(radius):
+    """(dx, dy) offsets of every pixel with dx*dx + dy*dy <= radius*radius."""
+    r = int(radius)
+    dy, dx = np.mgrid[-r:r + 1, -r:r + 1]
+    inside = dx * dx + dy * dy <= radius * radius
+    return dx[inside], dy[inside]
+
+
+class CoverageGrid:
+    """Visited bitmap and visit-frequency heatmap for one run, stamped for the whole flock per frame.
+
+    `visited` is a uint8 bitmap and `frequency` a uint32 count of boid stamps per pixel, both
+    (height, width). Only free pixels are ever marked. A running count of visited pixels keeps
+    `coverage_percent` and `free_space_percent` O(1). Pass a (height, width) uint32 array as `frequency` to accumulate
+    the heatmap somewhere specific, such as shared memory; it is zeroed first.
+    """
+
+    def __init__(self, free_mask, radius, frequency=None):
+        self.free = free_mask
+        self.height, self.width = free_mask.shape
+        self.num_free = int(free_mask.sum())
+        self.visited = np.zeros((self.height, self.width), dtype=np.uint8)
+        if frequency is None:
+            frequency = np.zeros((self.height, self.width), dtype=np.uint32)
+        else:
+            frequency[...] = 0
+        self.frequency = frequency
+        self.num_visited = 0
+        self.stencil_dx, self.stencil_dy = disk_stencil(radius)
+
+    def stamp(self, positions):
+        """Mark the disk around every (x, y) position; positions are truncated like int(x)."""
+        pixels = np.asarray(positions, dtype=float).reshape(-1, 2).astype(np.int64)
+        px = (pixels[:, 0, None] + self.stencil_dx[None, :]).ravel()
+        py = (pixels[:, 1, None] + self.stencil_dy[None, :]).ravel()
+        on_screen = (px >= 0) & (px < self.width) & (py >= 0) & (py < self.height)
+        flat = py[on_screen] * self.width + px[on_screen]
+        flat = flat[self.free.ravel()[flat]]
+
+        # several boids can stamp the same pixel in one frame, so count duplicates before adding
+        cells, counts = np.unique(flat, return_counts=True)
+        self.frequency.ravel()[cells] += counts.astype(np.uint32)
+        visited = self.visited.ravel()
+        self.num_visited += int(len(cells) - visited[cells].sum(dtype=np.int64))
+        visited[cells] = 1
+
+    def coverage_percent(self):
+        """Visited pixels as a percentage of the whole screen."""
+        return self.num_visited / (self.width * self.height) * 100
+
+    def free_space_percent(self):
+        """Visited pixels as a percentage of the free pixels."""
+        return self.num_visited / max(self.num_free, 1) * 100
+
+
+class EnsembleCoverage:
+    """The coverage of a CoverageGrid for B flocks at once, stamped from (B, N, 2) positions.
+
+    `visited` and `frequency` are (B, height, width) and `num_visited` is a (B,) array, as are the
+    percentages. Pass track_frequency=False when only coverage is needed, to skip the uint32 heatmaps.
+    """
+
+    def __init__(self, free_mask, radius, num_flocks, track_frequency=True):
+        self.free = free_mask
+        self.height, self.width = free_mask.shape
+        self.num_free = int(free_mask.sum())
+        self.num_flocks = num_flocks
+        self.visited = np.zeros((num_flocks, self.height, self.width), dtype=np.uint8)
+        self.frequency = np.zeros_like(self.visited, dtype=np.uint32) if track_frequency else None
+        self.num_visited = np.zeros(num_flocks, dtype=np.int64)
+        self.stencil_dx, self.stencil_dy = disk_stencil(radius)
+
+    def stamp(self, positions):
+        pixels = np.asarray(positions, dtype=float).reshape(self.num_flocks, -1, 2).astype(np.int64)
+        px = (pixels[..., 0, None] + self.stencil_dx).reshape(self.num_flocks, -1)
+        py = (pixels[..., 1, None] + self.stencil_dy).reshape(self.num_flocks, -1)
+        flock = np.broadcast_to(np.arange(self.num_flocks)[:, None], px.shape)
+        on_screen = (px >= 0) & (px < self.width) & (py >= 0) & (py < self.height)
+        plane = py[on_screen] * self.width + px[on_screen]
+        keep = self.free.ravel()[plane]
+        flat = flock[on_screen][keep] * (self.height * self.width) + plane[keep]
+
+        cells, counts = np.unique(flat, return_counts=True)
+        if self.frequency is not None:
+            self.frequency.ravel()[cells] += counts.astype(np.uint32)
+        visited = self.visited.ravel()
+        new_cells = cells[visited[cells] == 0]
+        self.num_visited += np.bincount(new_cells // (self.height * self.width), minlength=self.num_flocks)
+        visited[new_cells] = 1
+
+    def coverage_percent(self):
+        """(B,) visited pixels as a percentage of the whole screen."""
+        return self.num_visited / (self.width * self.height) * 100
+
+    def free_space_percent(self):
+        """(B,) visited pixels as a percentage of the free pixels."""
+        return self.num_visited / max(self.num_free, 1) * 100
+
+    def retain(self, keep):
+        """Drop the flocks where `keep` is False, matching FlockEnsemble.retain."""
+        self.visited = self.visited[keep]
+        if self.frequency is not None:
+            self.frequency = self.frequency[keep]
+        self.num_visited = self.num_visited[keep]
+        self.num_flocks = len(self.num_visited)
+
+
+def screen_to_free_percent(screen_percent, free_mask):
+    """Coverage in percent of the screen, as reported by run_coverage, in percent of the free pixels instead."""
+    return screen_percent * free_mask.size / max(int(free_mask.sum()), 1)
+
+
+def coverage_uniformity_batch(heatmaps, free_mask, chunk_size=16):
+    """Variance, mean, std and CV of visit frequency over the free pixels of many heatmaps.
+
+    `heatmaps` has shape (..., height, width), e.g. (seeds, H, W) or (gain vectors, seeds, H, W);
+    each returned array has the leading shape. Variance and std use ddof=1 like pandas. Sums are
+    exact integers; the variance comes from mean-centered float64 values, since n * sum(v^2) - sum(v)^2
+    overflows int64 on long or dense runs. Heatmaps are processed a chunk at a time to bound memory.
+    """
+    heatmaps = np.asarray(heatmaps)
+    batch_shape = heatmaps.shape[:-2]
+    flat = heatmaps.reshape(-1, *heatmaps.shape[-2:])
+    n = int(free_mask.sum())
+    sums = np.zeros(len(flat), dtype=np.float64)
+    variances = np.full(len(flat), np.nan)
+    for start in range(0, len(flat), chunk_size):
+        values = flat[start:start + chunk_size][:, free_mask]
+        sums[start:start + chunk_size] = values.sum(axis=1, dtype=np.int64)
+        if n > 1:
+            variances[start:start + chunk_size] = values.var(axis=1, ddof=1, dtype=np.float64)
+    means = sums / n if n else np.full(len(flat), np.nan)
+    stds = np.sqrt(variances)
+    with np.errstate(invalid="ignore", divide="ignore"):
+        cvs = stds / means
+    return tuple(a.reshape(batch_shape) for a in (variances, means, stds, cvs))
+
+
+def coverage_uniformity(heatmap, free_mask):
+    """(variance, mean, std_dev) of visit frequency over free pixels, or Nones if there are none."""
+    if not free_mask.any():
+        return None, None, None
+    variance, mean, std_dev, _ = coverage_uniformity_batch(heatmap, free_mask)
+    return float(variance), float(mean), float(std_dev)
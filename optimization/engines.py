@@ -0,0 +1,159 @@
+import math
+import numpy as np
+from flock import Flock, EPS
+
+try:
+    import numba
+except ImportError:
+    numba = None
+
+# Interchangeable flock engines. Every engine is a Flock: construct it with positions,
+# velocities, obstacles and the flock params, then call step(k_coh, k_ali, k_col, k_wall,
+# max_accel) and read positions/velocities. "numpy" is the vectorized Flock itself; the other
+# two run the per-boid rules of Boid.update in boids_opt.py one boid at a time through
+# step_kernel, as plain Python ("reference") or compiled with numba ("numba").
+
+
+def step_kernel(pos, vel, centers, sizes, width, height, neighbor_radius, avoid_radius, max_speed,
+                cos_half_fov, k_coh, k_ali, k_col, k_wall, max_accel, new_pos, new_vel):
+    """Advance every boid one frame from pos/vel into new_pos/new_vel, the rules of Boid.update.
+
+    Like Flock, every boid reads the flock as it was at the start of the frame. Written with
+    scalar indexing only so numba can compile it unchanged; pos and vel may be nested lists.
+    """
+    n = len(pos)
+    for i in range(n):
+        px, py = pos[i][0], pos[i][1]
+        vx, vy = vel[i][0], vel[i][1]
+        speed = math.sqrt(vx * vx + vy * vy)
+        fx, fy = vx / speed, vy / speed
+
+        count = 0
+        cx = cy = ax = ay = sx = sy = 0.0
+        for j in range(n):
+            dx, dy = pos[j][0] - px, pos[j][1] - py
+            dist = math.sqrt(dx * dx + dy * dy)
+            # within the radius and inside the field of view; also drops j == i
+            if dist < neighbor_radius and dx * fx + dy * fy > cos_half_fov * dist:
+                count += 1
+                cx += pos[j][0]
+                cy += pos[j][1]
+                ax += vel[j][0]
+                ay += vel[j][1]
+                if dist < avoid_radius:
+                    sx -= dx
+                    sy -= dy
+
+        coh_x = coh_y = ali_x = ali_y = 0.0
+        if count > 0:
+            coh_x, coh_y = (cx / count - px) * k_coh, (cy / count - py) * k_coh
+            ali_x, ali_y = (ax / count - vx) * k_ali, (ay / count - vy) * k_ali
+        sep_x, sep_y = sx * k_col, sy * k_col
+
+        obs_x = obs_y = 0.0
+        for m in range(len(sizes)):
+            ox, oy = px - centers[m][0], py - centers[m][1]
+            dist = math.sqrt(ox * ox + oy * oy)
+            if dist < sizes[m] + 40 and dist > 0:
+                magnitude = 500 / (dist * (dist + EPS))
+                obs_x += ox * magnitude
+                obs_y += oy * magnitude
+
+        wall_x = k_wall * (1.0 / (px + EPS) - 1.0 / (width - px + EPS))
+        wall_y = k_wall * (1.0 / (py + EPS) - 1.0 / (height - py + EPS))
+
+        # priority budget: separation, obstacles, walls, alignment, cohesion
+        acc_x = acc_y = 0.0
+        remaining = max_accel
+        for k in range(5):
+            if k == 0:
+                force_x, force_y = sep_x, sep_y
+            elif k == 1:
+                force_x, force_y = obs_x, obs_y
+            elif k == 2:
+                force_x, force_y = wall_x, wall_y
+            elif k == 3:
+                force_x, force_y = ali_x, ali_y
+            else:
+                force_x, force_y = coh_x, coh_y
+            if remaining <= 0:
+                break
+            length = math.sqrt(force_x * force_x + force_y * force_y)
+            if length <= remaining:
+                acc_x += force_x
+                acc_y += force_y
+                remaining -= length
+            else:
+                acc_x += force_x / length * remaining
+                acc_y += force_y / length * remaining
+                break
+
+        vx, vy = vx + acc_x, vy + acc_y
+        speed = math.sqrt(vx * vx + vy * vy)
+        if speed > max_speed:
+            vx, vy = vx * (max_speed / speed), vy * (max_speed / speed)
+        new_vel[i][0], new_vel[i][1] = vx, vy
+        new_pos[i][0], new_pos[i][1] = px + vx, py + vy
+
+
+class ReferenceFlock(Flock):
+    """Pure-Python engine: step_kernel over nested lists, one boid at a time."""
+
+    def step(self, k_coh, k_ali, k_col, k_wall, max_accel):
+        pos, vel = self.positions.tolist(), self.velocities.tolist()
+        new_pos, new_vel = [[0.0, 0.0] for _ in pos], [[0.0, 0.0] for _ in vel]
+        step_kernel(pos, vel, self.obstacle_centers.tolist(), self.obstacle_sizes.tolist(), self.width,
+                    self.height, self.neighbor_radius, self.avoid_radius, self.max_speed, self.cos_half_fov,
+                    k_coh, k_ali, k_col, k_wall, max_accel, new_pos, new_vel)
+        self.positions = np.array(new_pos, dtype=float).reshape(-1, 2)
+        self.velocities = np.array(new_vel, dtype=float).reshape(-1, 2)
+
+
+class NumbaFlock(Flock):
+    """step_kernel compiled with numba; needs the optional numba package."""
+
+    kernel = None
+
+    def __init__(self, *args, **kwargs):
+        if numba is None:
+            raise ImportError("the numba engine needs numba: pip install numba")
+        if NumbaFlock.kernel is None:
+            # staticmethod, or the dispatcher binds self as an extra first argument
+            NumbaFlock.kernel = staticmethod(numba.njit(cache=True)(step_kernel))
+        super().__init__(*args, **kwargs)
+        self.new_positions = np.empty_like(self.positions)
+        self.new_velocities = np.empty_like(self.velocities)
+
+    def step(self, k_coh, k_ali, k_col, k_wall, max_accel):
+        self.kernel(self.positions, self.velocities, self.obstacle_centers, self.obstacle_sizes,
+                    float(self.width), float(self.height), float(self.neighbor_radius), float(self.avoid_radius),
+                    float(self.max_speed), self.cos_half_fov, float(k_coh), float(k_ali), float(k_col),
+                    float(k_wall), float(max_accel), self.new_positions, self.new_velocities)
+        self.positions, self.new_positions = self.new_positions, self.positions
+        self.velocities, self.new_velocities = self.new_velocities, self.velocities
+
+
+ENGINES = {
+    "numpy": Flock,
+    "reference": ReferenceFlock,
+    "numba": NumbaFlock,
+}
+
+
+def available_engines():
+    return [name for name in ENGINES if name != "numba" or numba is not None]
+
+
+def compare_engines(positions, velocities, obstacles, gains, steps=100, engines=None, k_wall=10,
+                    max_accel=0.5, **params):
+    """Run the same start on every engine and return each one's largest position deviation from "reference"."""
+    runs = {}
+    for name in ["reference", *(e for e in (engines or available_engines()) if e != "reference")]:
+        engine = ENGINES[name](positions, velocities, obstacles, **params)
+        trajectory = []
+        for _ in range(steps):
+            engine.step(*gains, k_wall, max_accel)
+            trajectory.append(engine.positions.copy())
+        runs[name] = np.array(trajectory)
+    return {name: float(np.abs(run - runs["reference"]).max()) for name, run in runs.items() if name != "reference"}
+
@@ -0,0 +1,237 @@
+import math
+import os
+import sys
+import numpy as np
+from maps import Map
+
+# The spatial hash is shared with the interactive simulator, which keeps it in simulator/. Appended, so
+# modules of this directory still win any name clash
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), os.pardir, "simulator"))
+from spatial_hash import SpatialHash
+
+EPS = 1e-10
+GRID_MIN_BOIDS = 200  # below this the dense (N, N) neighbor mask beats the spatial hash
+OBSTACLE_RANGE = 40  # obstacles push boids within their size plus this
+OBSTACLE_CELL = 50  # side of the cells obstacle_table lists nearby obstacles for
+
+
+def obstacle_arrays(obstacles):
+    """Flatten a Map or a list of Obstacle objects into (M, 2) centers and (M,) sizes."""
+    if isinstance(obstacles, Map):
+        return obstacles.centers.copy(), obstacles.sizes.copy()
+    centers = np.array([(obs.position.x, obs.position.y) for obs in obstacles], dtype=float).reshape(-1, 2)
+    sizes = np.array([obs.size for obs in obstacles], dtype=float)
+    return centers, sizes
+
+
+def as_complex(vectors):
+    """View (..., 2) float vectors as (...,) complex x + iy, so an offset or a length is one array operation instead of two or three."""
+    return np.ascontiguousarray(vectors).view(np.complex128)[..., 0]
+
+
+def obstacle_table(centers, sizes, width, height, cell=OBSTACLE_CELL):
+    """(rows, cols, K) indices of the obstacles that can push a boid in each cell, padded with M.
+
+    An obstacle is listed for a cell when its range (size + OBSTACLE_RANGE, plus a pixel of
+    slack for rounding) reaches the cell's rectangle. The border cells extend to infinity, as
+    boids can be pushed past the screen edge and are looked up in the nearest cell. Index M
+    stands for a sentinel obstacle too far away to ever push anything.
+    """
+    cols, rows = math.ceil(width / cell), math.ceil(height / cell)
+    left, top = np.arange(cols) * float(cell), np.arange(rows) * float(cell)
+    right, bottom = left + cell, top + cell
+    left[0] = top[0] = -np.inf
+    right[-1] = bottom[-1] = np.inf
+    # distance from every obstacle center to every cell rectangle, (rows, cols, M)
+    gap_x = np.maximum(np.maximum(left[:, None] - centers[:, 0], centers[:, 0] - right[:, None]), 0)
+    gap_y = np.maximum(np.maximum(top[:, None] - centers[:, 1], centers[:, 1] - bottom[:, None]), 0)
+    reach = np.hypot(gap_y[:, None, :], gap_x[None, :, :]) < sizes + OBSTACLE_RANGE + 1
+    width_k = max(1, int(reach.sum(axis=-1).max()))
+    order = np.argsort(~reach, axis=-1, kind="stable")[..., :width_k]  # reaching obstacles first
+    return np.where(np.take_along_axis(reach, order, axis=-1), order, len(sizes))
+
+
+class Flock:
+    """Struct-of-arrays flock stepped with the same force rules as Boid.update in boids_opt.py.
+
+    Positions and velocities live in (N, 2) float arrays and every rule is evaluated for the
+    whole flock at once. Small flocks use a dense (N, N) neighbor mask; large ones find
+    neighbors through a SpatialHash rebuilt once per step. The only behavioural difference
+    from looping Boid.update is that all boids see the flock as it was at the start of the
+    frame, instead of seeing the boids earlier in the list already moved.
+
+    The dense path only indexes the trailing axes, so FlockEnsemble reuses it unchanged for
+    (B, N, 2) stacks of independent flocks.
+    """
+
+    def __init__(self, positions, velocities, obstacles=(), width=800, height=600,
+                 neighbor_radius=50, avoid_radius=20, max_speed=5, fov_angle=150, use_grid=None):
+        self.positions = np.array(positions, dtype=float).reshape(-1, 2)
+        self.velocities = np.array(velocities, dtype=float).reshape(-1, 2)
+        self.obstacle_centers, self.obstacle_sizes = obstacle_arrays(obstacles)
+        self.width = width
+        self.height = height
+        self.screen_size = np.array([width, height], dtype=float)
+        self.neighbor_radius = neighbor_radius
+        self.avoid_radius = avoid_radius
+        self.max_speed = max_speed
+        self.cos_half_fov = math.cos(math.radians(fov_angle / 2))
+        self.use_grid = use_grid  # None picks by flock size
+        self.spatial_hash = SpatialHash(neighbor_radius)
+        # Obstacle centers as complex x + iy and their ranges, plus a sentinel at index M far from
+        # everything. Each cell lists the obstacles near it so a boid is only tested against those,
+        # which is not worth it with only a few obstacles
+        self.obstacle_points = np.append(as_complex(self.obstacle_centers), 1e9 + 1e9j)
+        self.obstacle_reach = np.append(self.obstacle_sizes + OBSTACLE_RANGE, 0.0)
+        self.obstacle_cells = None
+        if len(self.obstacle_sizes):
+            table = obstacle_table(self.obstacle_centers, self.obstacle_sizes, width, height)
+            if table.shape[-1] < len(self.obstacle_sizes) / 2:
+                self.obstacle_cells = table
+
+    @classmethod
+    def from_boids(cls, boids, obstacles=(), **params):
+        positions = [(b.position.x, b.position.y) for b in boids]
+        velocities = [(b.velocity.x, b.velocity.y) for b in boids]
+        return cls(positions, velocities, obstacles, **params)
+
+    def __len__(self):
+        return len(self.positions)
+
+    def neighbor_mask(self):
+        """(N, N) mask of boids j that boid i perceives, plus the pairwise distances used to build it."""
+        z, v = as_complex(self.positions), as_complex(self.velocities)
+        forward = v / np.abs(v)
+        offset = z[..., None, :] - z[..., :, None]  # offset[i, j] = pos[j] - pos[i]
+        dist = np.abs(offset)
+        # angle < FOV/2 <=> forward . offset > cos(FOV/2) * |offset|; this also drops i == j.
+        # The dot product is the real part of offset * conj(forward)
+        in_view = (offset * forward.conj()[..., :, None]).real > self.cos_half_fov * dist
+        return (dist < self.neighbor_radius) & in_view, dist
+
+    def visible_pairs(self):
+        """Ordered pairs (i, j) where boid i perceives boid j, as (i, j, dx, dy, dist) from the spatial hash."""
+        self.spatial_hash.rebuild(self.positions)
+        i, j, dx, dy, dist = self.spatial_hash.pairs(self.neighbor_radius)
+        speed = np.sqrt((self.velocities ** 2).sum(axis=1))
+        fx, fy = self.velocities[:, 0] / speed, self.velocities[:, 1] / speed
+        # pairs keeps dist == radius, which Boid.update does not count as a neighbor
+        in_view = (dist < self.neighbor_radius) & (dx * fx[i] + dy * fy[i] > self.cos_half_fov * dist)
+        return i[in_view], j[in_view], dx[in_view], dy[in_view], dist[in_view]
+
+    def neighbor_sums(self):
+        """Per-boid neighbor count, summed neighbor [x, y, vx, vy], and summed pos[i] - pos[j] over close neighbors."""
+        pos, vel = self.positions, self.velocities
+        n = pos.shape[-2]
+        use_grid = self.use_grid if self.use_grid is not None else n >= GRID_MIN_BOIDS
+        if not use_grid:
+            mask, dist = self.neighbor_mask()
+            close = mask & (dist < self.avoid_radius)
+            # one matmul of the stacked [mask; close] rows against [x, y, vx, vy, 1] gives the neighbor
+            # sums, the close-neighbor position sums and both counts (the trailing column)
+            weights = np.concatenate([mask, close], axis=-2, dtype=float)
+            state = np.concatenate([pos, vel, np.ones(pos.shape[:-1] + (1,))], axis=-1)
+            totals = weights @ state
+            counts, sums = totals[..., :n, 4], totals[..., :n, :4]
+            avoid = pos * totals[..., n:, 4, None] - totals[..., n:, :2]
+            return counts, sums, avoid
+
+        i, j, dx, dy, dist = self.visible_pairs()
+        counts = np.bincount(i, minlength=n).astype(float)
+        state = np.hstack([pos, vel])[j]
+        sums = np.stack([np.bincount(i, weights=state[:, k], minlength=n) for k in range(4)], axis=1)
+        close = dist < self.avoid_radius
+        avoid = -np.stack([np.bincount(i[close], weights=dx[close], minlength=n),
+                           np.bincount(i[close], weights=dy[close], minlength=n)], axis=1)
+        return counts, sums, avoid
+
+    def flocking_forces(self, k_coh, k_ali, k_col):
+        pos, vel = self.positions, self.velocities
+        counts, sums, avoid = self.neighbor_sums()
+        has_neighbors = (counts > 0)[..., None]
+        safe_counts = np.maximum(counts, 1)[..., None]
+        cohesion = (sums[..., :2] / safe_counts - pos) * k_coh * has_neighbors
+        alignment = (sums[..., 2:] / safe_counts - vel) * k_ali * has_neighbors
+        separation = avoid * k_col
+        return cohesion, alignment, separation
+
+    def obstacle_forces(self):
+        if len(self.obstacle_sizes) == 0:
+            return np.zeros_like(self.positions)
+        z = as_complex(self.positions)
+        if self.obstacle_cells is None:
+            offset = z[..., None] - self.obstacle_points
+            reach = self.obstacle_reach
+        else:
+            # (..., N, K) candidate obstacles of each boid's cell
+            rows, cols = self.obstacle_cells.shape[:2]
+            row = np.minimum(np.maximum((z.imag // OBSTACLE_CELL).astype(np.intp), 0), rows - 1)
+            col = np.minimum(np.maximum((z.real // OBSTACLE_CELL).astype(np.intp), 0), cols - 1)
+            candidates = self.obstacle_cells[row, col]
+            offset = z[..., None] - self.obstacle_points[candidates]
+            reach = self.obstacle_reach[candidates]
+        dist = np.abs(offset)
+        active = (dist < reach) & (dist > 0)
+        # offset.normalize() * (1 / (distance + EPS)) * 500. Adding ~active to the denominator keeps
+        # inactive pairs (dist 0 included) finite without touching active ones, cheaper than np.where
+        magnitude = 500 / (dist * (dist + EPS) + ~active) * active
+        force = (offset * magnitude).sum(axis=-1)
+        return np.stack([force.real, force.imag], axis=-1)
+
+    def wall_forces(self, k_wall):
+        # x against the width and y against the height in one pass
+        pos = self.positions
+        return k_wall * (1.0 / (pos + EPS) - 1.0 / (self.screen_size - pos + EPS))
+
+    def step(self, k_coh, k_ali, k_col, k_wall, max_accel):
+        cohesion, alignment, separation = self.flocking_forces(k_coh, k_ali, k_col)
+        priority = [separation, self.obstacle_forces(), self.wall_forces(k_wall), alignment, cohesion]
+
+        # each force takes what it can from the remaining budget; a force that does not fit is
+        # scaled down to the leftover and everything after it gets nothing. The budget left for
+        # force k is max_accel minus the lengths of all forces before it, floored at zero.
+        forces = np.stack(priority)  # (5, ..., N, 2)
+        lengths = np.hypot(forces[..., 0], forces[..., 1])
+        spent_before = np.cumsum(lengths, axis=0) - lengths
+        take = np.minimum(lengths, np.maximum(max_accel - spent_before, 0.0))
+        scale = take / np.maximum(lengths, np.finfo(float).tiny)  # zero-length forces take nothing
+        accel = (forces * scale[..., None]).sum(axis=0)
+
+        self.velocities += accel
+        speed = np.hypot(self.velocities[..., 0], self.velocities[..., 1])
+        # max_speed / max(speed, max_speed) is exactly 1 for boids within the speed limit
+        self.velocities *= (self.max_speed / np.maximum(speed, self.max_speed))[..., None]
+        self.positions += self.velocities
+
+
+class FlockEnsemble(Flock):
+    """B independent flocks of N boids stepped together as (B, N, 2) arrays.
+
+    Every flock shares the map but has its own gain vector, so a whole batch of candidate gains
+    (times seeds) costs one set of array operations per frame instead of B interpreter loops.
+    Neighbors always come from the dense mask, which is what the ~100-boid optimization flocks
+    use anyway.
+    """
+
+    def __init__(self, flocks, gains, obstacles=(), **params):
+        if params.get("use_grid"):
+            raise ValueError("FlockEnsemble only supports the dense neighbor mask")
+        super().__init__(np.zeros((0, 2)), np.zeros((0, 2)), obstacles, **params)
+        self.use_grid = False
+        self.positions = np.stack([f.positions for f in flocks])
+        self.velocities = np.stack([f.velocities for f in flocks])
+        # (B, 3) -> three (B, 1, 1) columns that broadcast over each flock's (N, 2) forces
+        self.gains = np.asarray(gains, dtype=float).reshape(len(flocks), 3)
+
+    def __len__(self):
+        return len(self.positions)
+
+    def retain(self, keep):
+        """Drop the flocks where `keep` is False, e.g. gain vectors pruned partway through a run."""
+        self.positions = self.positions[keep]
+        self.velocities = self.velocities[keep]
+        self.gains = self.gains[keep]
+
+    def step(self, k_wall, max_accel):
+        k_coh, k_ali, k_col = (self.gains[:, k, None, None] for k in range(3))
+        super().step(k_coh, k_ali, k_col, k_wall, max_accel)
@@ -0,0 +1,184 @@
+import math
+import os
+import random
+import numpy as np
+from flock import FlockEnsemble
+from engines import ENGINES
+from coverage_grid import CoverageGrid, EnsembleCoverage
+from maps import as_map
+
+# params
+WIDTH, HEIGHT = 800, 600
+NUM_BOIDS = 100
+NEIGHBOR_RADIUS = 50
+AVOID_RADIUS = 20
+MAX_SPEED = 5
+FOV_ANGLE = 150
+COVERAGE_RADIUS = 2
+SIM_FPS = 60
+SIM_STEPS = 60 * SIM_FPS
+SEEDS = [27, 729, 4913]
+K_WALL = 10
+MAX_ACCEL = 0.5
+# flock engine: "numpy", "reference" or "numba" (see engines.py). Functions taking engine=None read
+# this when called, so it can be set here, at runtime, or with the BOIDS_ENGINE environment variable
+ENGINE = os.environ.get("BOIDS_ENGINE", "numpy")
+ENGINE_VERSION = 2  # bump whenever a change alters simulation results, to invalidate cached runs
+FLOCK_PARAMS = dict(width=WIDTH, height=HEIGHT, neighbor_radius=NEIGHBOR_RADIUS,
+                    avoid_radius=AVOID_RADIUS, max_speed=MAX_SPEED, fov_angle=FOV_ANGLE)
+
+
+def engine_name(engine=None):
+    """The engine to use: engine if given, else ENGINE as currently set. Raises ValueError for unknown names."""
+    engine = ENGINE if engine is None else engine
+    if engine not in ENGINES:
+        raise ValueError(f"unknown flock engine {engine!r}, expected one of {', '.join(ENGINES)}")
+    return engine
+
+
+def spawn_flock(obstacles, num_boids, seed, engine=None):
+    """Place num_boids outside every obstacle with random headings, reproducibly from seed.
+
+    The random draws are the same as the original Boid-based spawning in boids_opt.py, so there
+    a seed gives the same starting flock it always has. boids.py and boids_canary.py used to seed
+    the global random module and reject positions with their own Boid test (rectangles by
+    abs(dx) < size and abs(dy) < size), so their coverage runs start from different flocks than
+    before. obstacles may be a Map or an Obstacle list, and engine names the entry of
+    engines.ENGINES that steps it.
+    """
+    game_map = as_map(obstacles, width=WIDTH, height=HEIGHT)
+    rng = random.Random(seed)
+    positions, velocities = [], []
+    while len(positions) < num_boids:
+        x, y = rng.uniform(50, WIDTH - 50), rng.uniform(50, HEIGHT - 50)
+        if game_map.contains(x, y):
+            continue
+        # Boid(rng=rng) drew its own position and heading before they were overwritten
+        rng.uniform(50, WIDTH - 50), rng.uniform(50, HEIGHT - 50), rng.uniform(0, 2 * math.pi)
+        angle = rng.uniform(0, 2 * math.pi)
+        positions.append((x, y))
+        velocities.append((math.cos(angle) * MAX_SPEED, math.sin(angle) * MAX_SPEED))
+    return ENGINES[engine_name(engine)](positions, velocities, game_map, **FLOCK_PARAMS)
+
+
+def run_coverage(obstacles, gains, num_boids=NUM_BOIDS, seeds=SEEDS, steps=SIM_STEPS,
+                 k_wall=K_WALL, max_accel=MAX_ACCEL, observer=None, heatmaps=None, engine=None):
+    """Simulate one flock per seed for a fixed number of frames and track coverage, with no display.
+
+    Returns {seed: (coverage_over_time, heatmap)}. coverage_over_time holds screen coverage in
+    percent at the end of every simulated second (and after the last frame), so its last entry
+    is the final coverage; heatmap is the (HEIGHT, WIDTH) visit-frequency array.
+
+    observer(seed, frame, flock, coverage) is called after every frame when given, e.g. to
+    render; returning False ends that seed's run early. heatmaps may map a seed to a
+    (HEIGHT, WIDTH) uint32 array to accumulate that seed's heatmap into instead of a new one.
+    """
+    k_coh, k_ali, k_col = gains
+    game_map = as_map(obstacles, width=WIDTH, height=HEIGHT)
+    engine = engine_name(engine)
+    results = {}
+    for seed in seeds:
+        flock = spawn_flock(game_map, num_boids, seed, engine)
+        coverage = CoverageGrid(game_map.free_mask, COVERAGE_RADIUS, (heatmaps or {}).get(seed))
+        coverage_over_time = []
+        for frame in range(steps):
+            flock.step(k_coh, k_ali, k_col, k_wall, max_accel)
+            coverage.stamp(flock.positions)
+            stop = observer is not None and observer(seed, frame, flock, coverage) is False
+            if (frame + 1) % SIM_FPS == 0 or frame + 1 == steps or stop:
+                coverage_over_time.append(coverage.coverage_percent())
+            if stop:
+                break
+        results[seed] = (np.array(coverage_over_time), coverage.frequency)
+    return results
+
+
+def build_ensemble(obstacles, gain_vectors, seeds, num_boids):
+    """FlockEnsemble with one flock per (gain vector, seed) pair, gain-major, each started like spawn_flock."""
+    gain_vectors = np.asarray(gain_vectors, dtype=float).reshape(-1, 3)
+    game_map = as_map(obstacles, width=WIDTH, height=HEIGHT)
+    starts = {seed: spawn_flock(game_map, num_boids, seed, "numpy") for seed in seeds}
+    flocks = [starts[seed] for _ in range(len(gain_vectors)) for seed in seeds]
+    return FlockEnsemble(flocks, np.repeat(gain_vectors, len(seeds), axis=0), game_map, **FLOCK_PARAMS)
+
+
+def run_ensemble_coverage(obstacles, gain_vectors, seeds=SEEDS, num_boids=NUM_BOIDS, steps=SIM_STEPS,
+                          k_wall=K_WALL, max_accel=MAX_ACCEL, track_heatmaps=False, engine=None):
+    """Run every (gain vector, seed) pair as one flock of a single FlockEnsemble.
+
+    Each flock starts exactly like spawn_flock(obstacles, num_boids, seed) and follows the same
+    arithmetic as a lone Flock, so a pair scores the same as it would in run_coverage. Returns
+    (coverage, heatmaps): (G, S) final screen coverage in percent, and the (G, S, HEIGHT, WIDTH)
+    visit frequencies when track_heatmaps is set (None otherwise).
+
+    FlockEnsemble is the numpy engine; with any other engine every pair goes through
+    run_coverage one at a time instead, with the same results.
+    """
+    num_gains, num_seeds = len(np.reshape(gain_vectors, (-1, 3))), len(seeds)
+    game_map = as_map(obstacles, width=WIDTH, height=HEIGHT)
+    engine = engine_name(engine)
+    if engine != "numpy":
+        runs = [run_coverage(game_map, gains, num_boids, seeds, steps, k_wall, max_accel, engine=engine)
+                for gains in np.reshape(gain_vectors, (-1, 3))]
+        final = np.array([[run[seed][0][-1] for seed in seeds] for run in runs]).reshape(num_gains, num_seeds)
+        if not track_heatmaps:
+            return final, None
+        heatmaps = np.array([[run[seed][1] for seed in seeds] for run in runs])
+        return final, heatmaps.reshape(num_gains, num_seeds, HEIGHT, WIDTH)
+    ensemble = build_ensemble(game_map, gain_vectors, seeds, num_boids)
+    coverage = EnsembleCoverage(game_map.free_mask, COVERAGE_RADIUS,
+                                len(ensemble), track_frequency=track_heatmaps)
+    for _ in range(steps):
+        ensemble.step(k_wall, max_accel)
+        coverage.stamp(ensemble.positions)
+
+    final = coverage.coverage_percent().reshape(num_gains, num_seeds)
+    if not track_heatmaps:
+        return final, None
+    return final, coverage.frequency.reshape(num_gains, num_seeds, HEIGHT, WIDTH)
+
+
+def run_pruned_ensemble_coverage(obstacles, gain_vectors, pruner, seeds=SEEDS, num_boids=NUM_BOIDS,
+                                 steps=SIM_STEPS, k_wall=K_WALL, max_accel=MAX_ACCEL, engine=None):
+    """run_ensemble_coverage with gain vectors dropped at the pruner's checkpoints.
+
+    At every checkpoint frame the seed-averaged coverage of the gain vectors still running goes
+    to pruner.keep, and the rejected ones are removed from the ensemble so the rest of the run
+    costs less. Returns (coverage, stopped_at, curves): (G, S) coverage in percent when each gain
+    vector stopped, (G,) frames each one ran for (steps if never pruned), and (G, C) seed-averaged
+    coverage at the pruner's C checkpoints, NaN past the point where a gain vector stopped.
+
+    Pruning needs the whole batch in one FlockEnsemble, so only the numpy engine is supported.
+    """
+    if engine_name(engine) != "numpy":
+        raise ValueError(f"pruned runs only support the numpy engine, not {engine_name(engine)!r}; run without a pruner")
+    num_gains, num_seeds = len(np.reshape(gain_vectors, (-1, 3))), len(seeds)
+    game_map = as_map(obstacles, width=WIDTH, height=HEIGHT)
+    ensemble = build_ensemble(game_map, gain_vectors, seeds, num_boids)
+    coverage = EnsembleCoverage(game_map.free_mask, COVERAGE_RADIUS,
+                                len(ensemble), track_frequency=False)
+    final = np.zeros((num_gains, num_seeds))
+    stopped_at = np.full(num_gains, steps)
+    curves = np.full((num_gains, len(pruner.checkpoints)), np.nan)
+    checkpoints = {frame: column for column, frame in enumerate(pruner.checkpoints) if frame < steps}
+    active = np.arange(num_gains)
+    for frame in range(1, steps + 1):
+        ensemble.step(k_wall, max_accel)
+        coverage.stamp(ensemble.positions)
+        if frame not in checkpoints:
+            continue
+        current = coverage.coverage_percent().reshape(len(active), num_seeds)
+        curves[active, checkpoints[frame]] = current.mean(axis=1)
+        keep = pruner.keep(frame, current.mean(axis=1))
+        if keep.all():
+            continue
+        final[active[~keep]] = current[~keep]
+        stopped_at[active[~keep]] = frame
+        active = active[keep]
+        ensemble.retain(np.repeat(keep, num_seeds))
+        coverage.retain(np.repeat(keep, num_seeds))
+        if len(active) == 0:
+            break
+
+    final[active] = coverage.coverage_percent().reshape(len(active), num_seeds)
+    return final, stopped_at, curves
@@ -0,0 +1,118 @@
+import math
+import numpy as np
+from coverage_grid import free_space_mask
+
+SHAPES = ("circle", "square", "rectangle")
+
+
+class Map:
+    """Immutable, picklable obstacle layout precompiled into flat arrays.
+
+    Obstacles keep their original order across `shapes` (index into SHAPES), `centers` (M, 2),
+    `sizes` (M,) and `extents` (M, 2) rectangle width/height (NaN for other shapes), so per-
+    obstacle sums come out the same as from the Obstacle list. `circles`, `squares` and
+    `rectangles` are the per-shape rows. `free_mask` is the free_space_mask for the screen,
+    computed once. All arrays are read-only.
+    """
+
+    def __init__(self, name, shapes, centers, sizes, extents, width=800, height=600):
+        self.name = name
+        self.width = width
+        self.height = height
+        self.shapes = _frozen(np.asarray(shapes, dtype=np.int8).reshape(-1))
+        self.centers = _frozen(np.asarray(centers, dtype=float).reshape(-1, 2))
+        self.sizes = _frozen(np.asarray(sizes, dtype=float).reshape(-1))
+        self.extents = _frozen(np.asarray(extents, dtype=float).reshape(-1, 2))
+        self.free_mask = _frozen(free_space_mask(self.records(), width, height))
+
+    @classmethod
+    def from_obstacles(cls, name, obstacles, width=800, height=600):
+        shapes = [SHAPES.index(obs.shape) for obs in obstacles]
+        centers = [(obs.position.x, obs.position.y) for obs in obstacles]
+        sizes = [obs.size for obs in obstacles]
+        extents = [(obs.width, obs.height) if obs.shape == "rectangle" else (math.nan, math.nan)
+                   for obs in obstacles]
+        return cls(name, shapes, centers, sizes, extents, width, height)
+
+    def __len__(self):
+        return len(self.sizes)
+
+    def __setattr__(self, name, value):
+        if name in self.__dict__:
+            raise AttributeError(f"Map is immutable, cannot reassign {name!r}")
+        super().__setattr__(name, value)
+
+    def __getstate__(self):
+        # a bool per pixel dwarfs the obstacle arrays, so the mask travels bit-packed
+        state = dict(self.__dict__)
+        state["free_mask"] = np.packbits(self.free_mask)
+        return state
+
+    def __setstate__(self, state):
+        mask = np.unpackbits(state["free_mask"], count=state["height"] * state["width"])
+        state["free_mask"] = _frozen(mask.reshape(state["height"], state["width"]).astype(bool))
+        self.__dict__.update(state)
+
+    @property
+    def circles(self):
+        """(K, 3) rows of x, y, radius."""
+        return np.column_stack([self.centers, self.sizes])[self.shapes == 0]
+
+    @property
+    def squares(self):
+        """(K, 3) rows of x, y, half side."""
+        return np.column_stack([self.centers, self.sizes])[self.shapes == 1]
+
+    @property
+    def rectangles(self):
+        """(K, 5) rows of x, y, size, width, height."""
+        return np.column_stack([self.centers, self.sizes, self.extents])[self.shapes == 2]
+
+    def records(self):
+        """One ObstacleRecord per obstacle, in order, for code written against Obstacle lists."""
+        return [ObstacleRecord(SHAPES[shape], x, y, size, None if math.isnan(w) else w, None if math.isnan(h) else h)
+                for shape, (x, y), size, (w, h) in zip(self.shapes.tolist(), self.centers.tolist(),
+                                                      self.sizes.tolist(), self.extents.tolist())]
+
+    def contains(self, x, y):
+        """The spawn test: strictly inside a circle, or within size of the center on both axes otherwise."""
+        for shape, (cx, cy), size in zip(self.shapes.tolist(), self.centers.tolist(), self.sizes.tolist()):
+            if shape == 0:
+                if math.hypot(x - cx, y - cy) < size:
+                    return True
+            elif abs(x - cx) < size and abs(y - cy) < size:
+                return True
+        return False
+
+
+class ObstacleRecord:
+    """Lightweight stand-in for an Obstacle: shape, position (.x/.y), size and optional width/height."""
+
+    __slots__ = ("shape", "position", "size", "width", "height")
+
+    def __init__(self, shape, x, y, size, width=None, height=None):
+        self.shape = shape
+        self.position = Point(x, y)
+        self.size = size
+        self.width = width
+        self.height = height
+
+
+class Point:
+    __slots__ = ("x", "y")
+
+    def __init__(self, x, y):
+        self.x = x
+        self.y = y
+
+
+def as_map(obstacles, name=None, width=800, height=600):
+    """Return obstacles unchanged if already a Map, otherwise compile the Obstacle list into one."""
+    if isinstance(obstacles, Map):
+        return obstacles
+    return Map.from_obstacles(name, obstacles, width, height)
+
+
+def _frozen(array):
+    array.flags.writeable = False
+    return array
@@ -0,0 +1,61 @@
+import numpy as np
+
+# Pruning policies for stopping clearly bad gain vectors partway through a run.
+#
+# A pruner lists the frames at which runs are checked. At each checkpoint it is shown the
+# seed-averaged coverage of the gain vectors still running and says which may continue, by
+# comparing them with every value seen at that checkpoint so far (its history, which the parent
+# process fills in with record() as jobs finish) plus the batch being decided.
+
+
+class CheckpointPruner:
+    """Keep a gain vector at a checkpoint only if its coverage is at or above the given quantile."""
+
+    def __init__(self, checkpoints, quantile, min_samples=8):
+        self.checkpoints = sorted(int(c) for c in checkpoints)
+        self.quantile = quantile
+        self.min_samples = min_samples
+        self.history = {c: [] for c in self.checkpoints}
+
+    def keep(self, checkpoint, values):
+        """Bool mask over `values` (coverage at `checkpoint`) of the gain vectors allowed to continue."""
+        values = np.asarray(values, dtype=float)
+        reference = np.concatenate([self.history[checkpoint], values])
+        if len(reference) < self.min_samples:
+            return np.ones(len(values), dtype=bool)
+        return values >= np.quantile(reference, self.quantile)
+
+    def record(self, curves):
+        """Add finished runs to the history; curves is (G, len(checkpoints)), NaN past where a run stopped."""
+        for column, checkpoint in enumerate(self.checkpoints):
+            values = np.asarray(curves, dtype=float).reshape(-1, len(self.checkpoints))[:, column]
+            self.history[checkpoint].extend(values[~np.isnan(values)].tolist())
+
+
+class MedianStoppingRule(CheckpointPruner):
+    """Stop a run whose coverage falls below the median of all runs at the same point.
+
+    Checks every `interval` frames once `grace` frames have passed.
+    """
+
+    def __init__(self, steps, interval=600, grace=600, min_samples=8):
+        super().__init__(range(grace, steps, interval), 0.5, min_samples)
+
+
+class HyperbandRungs(CheckpointPruner):
+    """Asynchronous successive halving: rungs at min_steps * eta**k frames, and only the top
+    1/eta of the runs seen at a rung are promoted past it."""
+
+    def __init__(self, steps, min_steps=300, eta=3, min_samples=8):
+        rungs = []
+        rung = min_steps
+        while rung < steps:
+            rungs.append(rung)
+            rung *= eta
+        super().__init__(rungs, 1 - 1 / eta, min_samples)
+
+
+PRUNERS = {
+    "median": MedianStoppingRule,
+    "hyperband": HyperbandRungs,
+}
@@ -0,0 +1,105 @@
+import math
+import pygame
+import numpy as np
+from headless import WIDTH, HEIGHT, SIM_FPS
+from trails import Trails
+
+
+BOID_COLOR = (255, 255, 255)
+TRAIL_COLOR = (100, 100, 255)
+HEADINGS = 64            # quantized boid headings, steps of under 6 degrees
+MAX_TRAIL_SAMPLES = 16   # pixels sampled per trail segment, more than a boid moves in a frame
+boid_sprites = []        # one pre-rotated triangle per heading, built on the first draw
+
+
+def render_boid_sprite(angle):
+    """The boid triangle at one heading, centered on a colorkeyed square: nose 10 px ahead, wings 6 px out at +-150 degrees."""
+    half = 11
+    surface = pygame.Surface((2 * half + 1, 2 * half + 1))
+    surface.set_colorkey((0, 0, 0), pygame.RLEACCEL)  # colorkeyed blits are much faster than per-pixel alpha
+    points = [(half + length * math.cos(angle + turn), half + length * math.sin(angle + turn))
+              for length, turn in ((10.0, 0.0), (6.0, math.radians(150)), (6.0, math.radians(-150)))]
+    pygame.draw.polygon(surface, BOID_COLOR, points)
+    return surface
+
+
+def draw_trails(surface, trails):
+    """Plot every (N, T, 2) trail, oldest first, into the surface's pixels in one vectorized pass; returns one rect per trail.
+
+    Each segment is sampled at whole-pixel steps, so the trails come out as connected 1 px lines
+    like pygame.draw.lines would draw them, without a draw call per boid.
+    """
+    trails32 = trails.astype(np.float32)
+    steps = np.diff(trails32, axis=1)
+    samples = int(min(max(np.ceil(np.abs(steps).max()), 1), MAX_TRAIL_SAMPLES))
+    t = np.arange(samples + 1, dtype=np.float32) / samples  # both ends, so the newest point is plotted too
+    xs = np.floor(trails32[:, :-1, 0, None] + steps[:, :, 0, None] * t + 0.5).astype(np.int32).ravel()
+    ys = np.floor(trails32[:, :-1, 1, None] + steps[:, :, 1, None] * t + 0.5).astype(np.int32).ravel()
+    width, height = surface.get_size()
+    inside = (xs >= 0) & (xs < width) & (ys >= 0) & (ys < height)
+    pixels = pygame.surfarray.pixels2d(surface)
+    pixels[xs[inside], ys[inside]] = surface.map_rgb(TRAIL_COLOR)
+    del pixels  # unlocks the surface
+
+    low = np.floor(trails.min(axis=1)).astype(np.int64)
+    size = np.ceil(trails.max(axis=1)).astype(np.int64) - low + 1
+    return [pygame.Rect(x, y, w, h) for (x, y), (w, h) in zip(low.tolist(), size.tolist())]
+
+
+def draw_flock(surface, positions, velocities, trails=None):
+    """Draw each (N, T, 2) trail, oldest first, and every boid as a pre-rotated sprite in one blit pass; returns the rects drawn."""
+    if not boid_sprites:
+        boid_sprites.extend(render_boid_sprite(2 * math.pi * i / HEADINGS) for i in range(HEADINGS))
+    drawn = []
+    if trails is not None and trails.shape[1] > 1:
+        drawn.extend(draw_trails(surface, trails))
+
+    angles = np.arctan2(velocities[:, 1], velocities[:, 0])  # zero velocity gives heading 0
+    headings = np.rint(angles * (HEADINGS / (2 * math.pi))).astype(np.int64) % HEADINGS
+    half = boid_sprites[0].get_width() // 2
+    corners = np.rint(positions).astype(np.int64) - half  # top-left corners, so each sprite's center lands on its boid
+    drawn.extend(surface.blits([(boid_sprites[k], corner) for k, corner in zip(headings.tolist(), corners.tolist())]))
+    return drawn
+
+
+class CoverageWindow:
+    """Window that draws a coverage run, passed to run_coverage as its observer.
+
+    Obstacles never move during a run, so they are drawn once onto a background surface. Each
+    frame restores only what the previous frame drew and pushes just those rectangles and the new
+    ones to the display. Closing the window stops the run. Call close() once the run is done.
+    """
+
+    def __init__(self, obstacles, num_boids, trail_length):
+        pygame.init()
+        self.screen = pygame.display.set_mode((WIDTH, HEIGHT))
+        self.font = pygame.font.SysFont("consolas", 14)
+        self.trails = Trails(num_boids, trail_length)
+
+        self.background = pygame.Surface((WIDTH, HEIGHT))
+        self.background.fill((30, 30, 30))
+        for obs in obstacles:
+            obs.draw(self.background)
+        self.screen.blit(self.background, (0, 0))
+        pygame.display.flip()
+        self.dirty = []  # what the previous frame drew, erased and pushed to the display with this frame
+
+    def __call__(self, seed, frame, flock, coverage):
+        if any(event.type == pygame.QUIT for event in pygame.event.get()):
+            return False
+
+        for rect in self.dirty:
+            self.screen.blit(self.background, rect, rect)
+
+        self.trails.push(flock.positions)
+        drawn = draw_flock(self.screen, flock.positions, flock.velocities, self.trails.points())
+
+        drawn.append(self.screen.blit(self.font.render(f"Seed {seed} | Time: {frame / SIM_FPS:.1f}s", True, (200, 200, 200)),
+                                      (WIDTH - 200, 10)))
+        drawn.append(self.screen.blit(self.font.render(f"Screen {coverage.coverage_percent():.1f}% | Free {coverage.free_space_percent():.1f}%",
+                                                       True, (200, 200, 200)), (WIDTH - 200, 28)))
+        pygame.display.update(self.dirty + drawn)
+        self.dirty = drawn
+
+    def close(self):
+        pygame.quit()
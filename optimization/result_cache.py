@@ -0,0 +1,154 @@
+import hashlib
+import json
+import os
+import tempfile
+import zipfile
+import numpy as np
+from maps import Map
+from headless import (run_coverage, engine_name, ENGINE_VERSION, NUM_BOIDS, SIM_STEPS, K_WALL, MAX_ACCEL,
+                      COVERAGE_RADIUS, SIM_FPS, FLOCK_PARAMS)
+
+CACHE_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), ".result_cache")
+MAX_CACHE_BYTES = 2 * 1024 ** 3
+RESCAN_EVERY = 256  # writes between full directory scans, to account for other workers' entries
+
+
+def map_fingerprint(obstacles):
+    """Everything about a Map or obstacle list that affects a run: shape, center, size and rectangle width/height.
+
+    A Map and the Obstacle list it was compiled from give the same fingerprint.
+    """
+    if isinstance(obstacles, Map):
+        obstacles = obstacles.records()
+    return [(obs.shape, float(obs.position.x), float(obs.position.y), float(obs.size),
+             *((float(obs.width), float(obs.height)) if obs.shape == "rectangle" else (None, None)))
+            for obs in obstacles]
+
+
+def cache_key(obstacles, gains, seed, num_boids, steps, k_wall, max_accel, engine=None):
+    """sha256 over the gains, seed, map, boid count, step budget and everything else a run depends on."""
+    spec = dict(
+        engine=engine_name(engine), engine_version=ENGINE_VERSION, gains=[float(g) for g in gains], seed=int(seed),
+        map=map_fingerprint(obstacles),
+        num_boids=int(num_boids), steps=int(steps), k_wall=float(k_wall), max_accel=float(max_accel),
+        coverage_radius=COVERAGE_RADIUS, sim_fps=SIM_FPS, flock=FLOCK_PARAMS,
+    )
+    return hashlib.sha256(json.dumps(spec, sort_keys=True).encode()).hexdigest()
+
+
+class ResultCache:
+    """On-disk cache of (coverage_over_time, heatmap) per run, one .npz file per key.
+
+    Safe to share between pool workers: entries are written to a temporary file and renamed into
+    place, so readers only ever see complete files, and losing a race to write or evict the same
+    entry is harmless. Reads refresh an entry's mtime, and once the directory grows past
+    max_bytes the least recently used entries are deleted.
+
+    Scanning the directory costs O(entries), so put() does not do it on every write: it keeps
+    a running estimate of the directory size, starting from one scan and adding what this
+    process writes, and only scans (and evicts) when the estimate crosses max_bytes or every
+    RESCAN_EVERY writes, whichever comes first. A truncated or corrupt entry reads as a miss
+    and is deleted.
+    """
+
+    def __init__(self, directory=CACHE_DIR, max_bytes=MAX_CACHE_BYTES):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self.size_estimate = None  # bytes, None until the first put()
+        self.writes_since_scan = 0
+
+    def path(self, key):
+        return os.path.join(self.directory, key[:2], key + ".npz")
+
+    def get(self, key):
+        path = self.path(key)
+        try:
+            with np.load(path) as data:
+                result = data["coverage_over_time"], data["heatmap"]
+            os.utime(path)
+        except OSError:
+            return None
+        except (zipfile.BadZipFile, EOFError, KeyError, ValueError):
+            try:
+                os.unlink(path)  # torn or corrupt, drop it so the next run rewrites it
+            except FileNotFoundError:
+                pass
+            return None
+        return result
+
+    def put(self, key, coverage_over_time, heatmap):
+        path = self.path(key)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path), suffix=".tmp")
+        try:
+            with os.fdopen(fd, "wb") as f:
+                np.savez_compressed(f, coverage_over_time=coverage_over_time, heatmap=heatmap)
+            size = os.path.getsize(tmp_path)
+            os.replace(tmp_path, path)
+        except BaseException:
+            os.unlink(tmp_path)
+            raise
+        if self.size_estimate is None:
+            self.size_estimate = self.evict()
+            return
+        self.size_estimate += size
+        self.writes_since_scan += 1
+        if self.size_estimate > self.max_bytes or self.writes_since_scan >= RESCAN_EVERY:
+            self.size_estimate = self.evict()
+
+    def evict(self):
+        """Delete least recently used entries until the directory fits in max_bytes. Returns its size afterwards."""
+        self.writes_since_scan = 0
+        entries = []
+        for root, _, files in os.walk(self.directory):
+            for name in files:
+                if not name.endswith(".npz"):
+                    continue
+                try:
+                    stat = os.stat(os.path.join(root, name))
+                except FileNotFoundError:
+                    continue
+                entries.append((stat.st_mtime, stat.st_size, os.path.join(root, name)))
+        total = sum(size for _, size, _ in entries)
+        for _, size, path in sorted(entries):
+            if total <= self.max_bytes:
+                break
+            try:
+                os.unlink(path)
+            except FileNotFoundError:
+                pass
+            total -= size
+        return total
+
+
+_default_cache = None
+
+
+def default_cache():
+    """This process's ResultCache on CACHE_DIR, shared so its size estimate carries across calls."""
+    global _default_cache
+    if _default_cache is None:
+        _default_cache = ResultCache()
+    return _default_cache
+
+
+def cached_run_coverage(obstacles, gains, seed, num_boids=NUM_BOIDS, steps=SIM_STEPS,
+                        k_wall=K_WALL, max_accel=MAX_ACCEL, cache=None, out=None, engine=None):
+    """run_coverage for a single seed, memoized on disk. Returns (coverage_over_time, heatmap).
+
+    When `out` is given the heatmap is written into it, whether it was simulated or cached.
+    """
+    cache = cache or default_cache()
+    engine = engine_name(engine)  # resolved once, so the key and the run agree
+    key = cache_key(obstacles, gains, seed, num_boids, steps, k_wall, max_accel, engine)
+    cached = cache.get(key)
+    if cached is not None:
+        if out is None:
+            return cached
+        out[...] = cached[1]
+        return cached[0], out
+    heatmaps = None if out is None else {seed: out}
+    coverage_over_time, heatmap = run_coverage(obstacles, gains, num_boids, [seed], steps, k_wall, max_accel,
+                                               heatmaps=heatmaps, engine=engine)[seed]
+    cache.put(key, coverage_over_time, heatmap)
+    return coverage_over_time, heatmap
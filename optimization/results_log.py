@@ -0,0 +1,120 @@
+import csv
+import os
+from collections import defaultdict
+
+# Append-only log of single (gain vector, seed) results, written as each job finishes so an
+# interrupted optimization can pick up where it stopped. Gains are written with repr() so they
+# read back as the exact same floats and keys match across restarts. Each row also records the seed
+# of the random search that drew its gain vector, so a restart can redraw the same candidates.
+
+LOG_FIELDS = ["map", "num_boids", "steps", "k_coh", "k_ali", "k_col", "seed", "coverage", "stopped_at_step",
+              "search_seed"]
+
+
+def result_key(map_name, num_boids, steps, gain_vector, seed):
+    return (map_name, int(num_boids), int(steps), tuple(float(g) for g in gain_vector), int(seed))
+
+
+class ResultLog:
+    """CSV result log keyed by (map, boid count, step budget, gain vector, seed)."""
+
+    def __init__(self, path):
+        self.path = path
+        if os.path.exists(path):
+            self._drop_torn_line()
+
+    def rows(self):
+        """Yield every complete row; a line cut short by a crash mid-write is skipped.
+
+        Only lines ending in a newline count: a row torn inside its last field can still parse,
+        e.g. a search_seed of 3600 cut down to 36.
+        """
+        if not os.path.exists(self.path):
+            return
+        with open(self.path, newline="") as f:
+            for row in csv.DictReader(line for line in f if line.endswith("\n")):
+                try:
+                    yield dict(
+                        map=row["map"], num_boids=int(row["num_boids"]), steps=int(row["steps"]),
+                        gains=(float(row["k_coh"]), float(row["k_ali"]), float(row["k_col"])),
+                        seed=int(row["seed"]), coverage=float(row["coverage"]),
+                        stopped_at_step=int(row["stopped_at_step"]),
+                        search_seed=int(row["search_seed"]),
+                    )
+                except (KeyError, TypeError, ValueError):
+                    continue
+
+    def completed_keys(self):
+        return {result_key(r["map"], r["num_boids"], r["steps"], r["gains"], r["seed"]) for r in self.rows()}
+
+    def append(self, map_name, num_boids, steps, results, search_seed, stopped_at=None):
+        """Append (gain_vector, seed, coverage) results and flush them to disk.
+
+        search_seed is the seed of the random search the gain vectors came from. stopped_at maps a
+        gain vector to the frame it was pruned at; anything missing ran all steps.
+        """
+        stopped_at = stopped_at or {}
+        new_file = not os.path.exists(self.path) or os.path.getsize(self.path) == 0
+        with open(self.path, "a", newline="") as f:
+            writer = csv.writer(f)
+            if new_file:
+                writer.writerow(LOG_FIELDS)
+            for gain_vector, seed, coverage in results:
+                writer.writerow([map_name, num_boids, steps, *(repr(float(g)) for g in gain_vector), seed,
+                                 repr(float(coverage)), stopped_at.get(tuple(gain_vector), steps),
+                                 search_seed])
+            f.flush()
+            os.fsync(f.fileno())
+
+    def _drop_torn_line(self):
+        """Cut a line left without its newline by a crash, so the next row does not complete it.
+
+        Run once when the log is opened; every append ends its rows with a newline.
+        """
+        with open(self.path, "rb+") as f:
+            data = f.read()
+            if data and not data.endswith(b"\n"):
+                f.truncate(data.rfind(b"\n") + 1)  # 0 when even the header was torn
+
+
+def aggregate(log, map_name, num_boids, steps, seeds, results_path, pruned_path=None):
+    """Average a log's results over seeds into the random_search_results CSV format.
+
+    Only gain vectors with every seed run for the full step budget go to results_path; pruned
+    ones go to pruned_path (with their stopped_at_step) when it is given. Returns
+    (best gain vector, best average, number of full vectors, number of pruned vectors).
+    """
+    coverage = defaultdict(dict)
+    stopped = {}
+    for row in log.rows():
+        if (row["map"], row["num_boids"], row["steps"]) != (map_name, num_boids, steps):
+            continue
+        coverage[row["gains"]][row["seed"]] = row["coverage"]
+        stopped[row["gains"]] = min(stopped.get(row["gains"], steps), row["stopped_at_step"])
+
+    header = ["k_coh", "k_ali", "k_col", *(f"coverage_seed_{seed}" for seed in sorted(seeds)), "average"]
+    best, best_cov = None, -1
+    full, pruned = [], []
+    for gvec, seed_to_cov in coverage.items():
+        if not all(seed in seed_to_cov for seed in seeds):
+            continue
+        cov_list = [seed_to_cov[seed] for seed in sorted(seeds)]
+        avg_cov = sum(cov_list) / len(cov_list)
+        if stopped[gvec] < steps:
+            pruned.append([*gvec, *cov_list, avg_cov, stopped[gvec]])
+            continue
+        full.append([*gvec, *cov_list, avg_cov])
+        if avg_cov > best_cov:
+            best_cov = avg_cov
+            best = gvec
+
+    with open(results_path, "w", newline="") as f:
+        writer = csv.writer(f)
+        writer.writerow(header)
+        writer.writerows(full)
+    if pruned_path is not None and pruned:
+        with open(pruned_path, "w", newline="") as f:
+            writer = csv.writer(f)
+            writer.writerow([*header, "stopped_at_step"])
+            writer.writerows(pruned)
+    return best, best_cov, len(full), len(pruned)
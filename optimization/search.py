@@ -0,0 +1,255 @@
+import math
+import numpy as np
+
+# Gain optimizers with a common ask/tell interface, driven by `optimize`.
+#
+# ask() returns (candidates, fraction): a list of gain vectors and the fraction of the full step
+# budget to simulate them for. tell(candidates, scores) hands back the average coverage of each.
+# Everything works in a [0, 1]^d box internally and maps to the real gain bounds at the edges.
+
+
+class RandomSearch:
+    """Uniform sampling over the bounds, the baseline the other optimizers are measured against."""
+
+    def __init__(self, bounds, batch_size=16, seed=None):
+        self.bounds = np.asarray(bounds, dtype=float)
+        self.batch_size = batch_size
+        self.rng = np.random.default_rng(seed)
+
+    def ask(self):
+        unit = self.rng.uniform(size=(self.batch_size, len(self.bounds)))
+        return to_bounds(unit, self.bounds), 1.0
+
+    def tell(self, candidates, scores):
+        pass
+
+    def done(self):
+        return False
+
+
+class CMAES:
+    """(mu/mu_w, lambda) CMA-ES maximizing the score; stops once the search distribution collapses below `tol`."""
+
+    def __init__(self, bounds, sigma=0.3, population=None, seed=None, tol=1e-3):
+        self.bounds = np.asarray(bounds, dtype=float)
+        self.rng = np.random.default_rng(seed)
+        self.tol = tol
+        n = self.n = len(self.bounds)
+        self.population = population or 4 + int(3 * math.log(n))
+        self.mu = self.population // 2
+        weights = math.log(self.mu + 0.5) - np.log(np.arange(1, self.mu + 1))
+        self.weights = weights / weights.sum()
+        self.mueff = 1 / (self.weights ** 2).sum()
+
+        self.cc = (4 + self.mueff / n) / (n + 4 + 2 * self.mueff / n)
+        self.cs = (self.mueff + 2) / (n + self.mueff + 5)
+        self.c1 = 2 / ((n + 1.3) ** 2 + self.mueff)
+        self.cmu = min(1 - self.c1, 2 * (self.mueff - 2 + 1 / self.mueff) / ((n + 2) ** 2 + self.mueff))
+        self.damps = 1 + 2 * max(0, math.sqrt((self.mueff - 1) / (n + 1)) - 1) + self.cs
+        self.chi_n = math.sqrt(n) * (1 - 1 / (4 * n) + 1 / (21 * n * n))
+
+        self.mean = np.full(n, 0.5)
+        self.sigma = sigma
+        self.pc = np.zeros(n)
+        self.ps = np.zeros(n)
+        self.C = np.eye(n)
+        self.B = np.eye(n)
+        self.D = np.ones(n)
+        self.generation = 0
+        self.steps = None
+
+    def ask(self):
+        z = self.rng.standard_normal((self.population, self.n))
+        steps = z @ (self.B * self.D).T  # samples of N(0, C)
+        unit = np.clip(self.mean + self.sigma * steps, 0.0, 1.0)
+        # tell() adapts from the points actually evaluated, so steps that crossed a bound are cut back to it
+        self.steps = (unit - self.mean) / self.sigma
+        return to_bounds(unit, self.bounds), 1.0
+
+    def tell(self, candidates, scores):
+        self.generation += 1
+        best = np.argsort(-np.asarray(scores))[:self.mu]
+        selected = self.steps[best]
+        step = self.weights @ selected
+        self.mean = np.clip(self.mean + self.sigma * step, 0.0, 1.0)
+
+        inv_sqrt_c = self.B @ np.diag(1 / self.D) @ self.B.T
+        self.ps = (1 - self.cs) * self.ps + math.sqrt(self.cs * (2 - self.cs) * self.mueff) * inv_sqrt_c @ step
+        ps_norm = np.linalg.norm(self.ps)
+        hsig = ps_norm / math.sqrt(1 - (1 - self.cs) ** (2 * self.generation)) / self.chi_n < 1.4 + 2 / (self.n + 1)
+        self.pc = (1 - self.cc) * self.pc + hsig * math.sqrt(self.cc * (2 - self.cc) * self.mueff) * step
+
+        rank_mu = (self.weights[:, None, None] * selected[:, :, None] * selected[:, None, :]).sum(axis=0)
+        self.C = ((1 - self.c1 - self.cmu) * self.C
+                  + self.c1 * (np.outer(self.pc, self.pc) + (1 - hsig) * self.cc * (2 - self.cc) * self.C)
+                  + self.cmu * rank_mu)
+        self.sigma *= math.exp((self.cs / self.damps) * (ps_norm / self.chi_n - 1))
+
+        self.C = (self.C + self.C.T) / 2
+        eigenvalues, self.B = np.linalg.eigh(self.C)
+        self.D = np.sqrt(np.maximum(eigenvalues, 1e-20))
+
+    def done(self):
+        return self.sigma * self.D.max() < self.tol
+
+
+class GaussianProcessSearch:
+    """Bayesian optimization with a GP surrogate (RBF kernel) and expected improvement.
+
+    Starts from `initial_points` uniform samples, then proposes `batch_size` points per round,
+    each the best of `num_candidates` random points by EI, fantasizing the earlier picks of the
+    round at their predicted mean so a batch spreads out. The kernel length scale is chosen by
+    marginal likelihood from a small grid on every refit.
+    """
+
+    LENGTH_SCALES = (0.05, 0.1, 0.2, 0.4, 0.8)
+
+    def __init__(self, bounds, initial_points=8, batch_size=4, noise=1e-2, num_candidates=2048, seed=None):
+        self.bounds = np.asarray(bounds, dtype=float)
+        self.initial_points = initial_points
+        self.batch_size = batch_size
+        self.noise = noise
+        self.num_candidates = num_candidates
+        self.rng = np.random.default_rng(seed)
+        self.X = np.zeros((0, len(self.bounds)))
+        self.y = np.zeros(0)
+
+    def ask(self):
+        if len(self.X) < self.initial_points:
+            unit = self.rng.uniform(size=(self.initial_points - len(self.X), len(self.bounds)))
+            return to_bounds(unit, self.bounds), 1.0
+
+        X, y = self.X, self.y
+        picks = []
+        for _ in range(self.batch_size):
+            model = fit_gp(X, y, self.noise, self.LENGTH_SCALES)
+            candidates = self.rng.uniform(size=(self.num_candidates, len(self.bounds)))
+            mean, std = predict_gp(model, candidates)
+            x = candidates[np.argmax(expected_improvement(mean, std, y.max()))]
+            picks.append(x)
+            X = np.vstack([X, x])
+            y = np.append(y, predict_gp(model, x[None, :])[0])
+        return to_bounds(np.array(picks), self.bounds), 1.0
+
+    def tell(self, candidates, scores):
+        self.X = np.vstack([self.X, to_unit(np.asarray(candidates, dtype=float), self.bounds)])
+        self.y = np.append(self.y, scores)
+
+    def done(self):
+        return False
+
+
+class SuccessiveHalving:
+    """Successive halving over the simulation length.
+
+    Starts `num_candidates` random gain vectors at `min_fraction` of the step budget, keeps the
+    best 1/eta of them, multiplies the budget by eta, and repeats until the survivors have been
+    run for the full budget.
+    """
+
+    def __init__(self, bounds, num_candidates=27, eta=3, min_fraction=1 / 9, seed=None):
+        self.bounds = np.asarray(bounds, dtype=float)
+        self.eta = eta
+        rng = np.random.default_rng(seed)
+        self.survivors = to_bounds(rng.uniform(size=(num_candidates, len(self.bounds))), self.bounds)
+        self.fraction = min_fraction
+        self.finished = False
+
+    def ask(self):
+        return self.survivors, min(self.fraction, 1.0)
+
+    def tell(self, candidates, scores):
+        if self.fraction >= 1.0:
+            self.finished = True
+            return
+        keep = max(1, len(candidates) // self.eta)
+        self.survivors = np.asarray(candidates)[np.argsort(-np.asarray(scores))[:keep]]
+        self.fraction *= self.eta
+
+    def done(self):
+        return self.finished
+
+
+OPTIMIZERS = {
+    "random": RandomSearch,
+    "cmaes": CMAES,
+    "gp": GaussianProcessSearch,
+    "halving": SuccessiveHalving,
+}
+
+
+def optimize(optimizer, objective, max_simulations, patience=None, tol=1e-3):
+    """Run `optimizer` against `objective` until a stopping criterion fires.
+
+    objective(candidates, fraction) -> (scores, simulations) returns the average coverage of each
+    candidate and how many full-length simulations it cost (a run of half the steps counts as half).
+    Stops when the simulation budget is spent, when the optimizer reports convergence, or after
+    `patience` rounds without the best full-length score improving by more than `tol`.
+
+    Returns (best_gains, best_score, history), where history is a list of
+    (simulations_used, best_score, best_gains) after every round.
+    """
+    best_gains, best_score = None, -math.inf
+    used, stale = 0.0, 0
+    history = []
+    while used < max_simulations and not optimizer.done():
+        candidates, fraction = optimizer.ask()
+        scores, cost = objective(candidates, fraction)
+        scores = np.asarray(scores, dtype=float)
+        optimizer.tell(candidates, scores)
+        used += cost
+
+        # only full-length runs are comparable with the coverage numbers in data/*.csv
+        improved = False
+        if fraction >= 1.0 and len(scores):
+            i = int(np.argmax(scores))
+            if scores[i] > best_score + tol:
+                improved = True
+            if scores[i] > best_score:
+                best_gains, best_score = tuple(float(g) for g in candidates[i]), float(scores[i])
+        stale = 0 if improved else stale + 1
+        history.append((used, best_score, best_gains))
+        if patience is not None and stale >= patience:
+            break
+    return best_gains, best_score, history
+
+
+def to_bounds(unit, bounds):
+    return bounds[:, 0] + unit * (bounds[:, 1] - bounds[:, 0])
+
+
+def to_unit(x, bounds):
+    return (x - bounds[:, 0]) / (bounds[:, 1] - bounds[:, 0])
+
+
+def fit_gp(X, y, noise, length_scales):
+    """Fit a zero-mean GP to standardized y, picking the length scale with the best marginal likelihood."""
+    y_mean, y_std = y.mean(), y.std() or 1.0
+    target = (y - y_mean) / y_std
+    sq_dist = ((X[:, None, :] - X[None, :, :]) ** 2).sum(axis=2)
+    best = None
+    for length_scale in length_scales:
+        K = np.exp(-sq_dist / (2 * length_scale ** 2)) + noise * np.eye(len(X))
+        L = np.linalg.cholesky(K)
+        alpha = np.linalg.solve(L.T, np.linalg.solve(L, target))
+        log_likelihood = -0.5 * target @ alpha - np.log(np.diag(L)).sum()
+        if best is None or log_likelihood > best[0]:
+            best = (log_likelihood, length_scale, L, alpha)
+    _, length_scale, L, alpha = best
+    return dict(X=X, L=L, alpha=alpha, length_scale=length_scale, y_mean=y_mean, y_std=y_std)
+
+
+def predict_gp(model, points):
+    sq_dist = ((points[:, None, :] - model["X"][None, :, :]) ** 2).sum(axis=2)
+    k = np.exp(-sq_dist / (2 * model["length_scale"] ** 2))
+    mean = k @ model["alpha"]
+    v = np.linalg.solve(model["L"], k.T)
+    std = np.sqrt(np.maximum(1 - (v ** 2).sum(axis=0), 1e-12))
+    return mean * model["y_std"] + model["y_mean"], std * model["y_std"]
+
+
+def expected_improvement(mean, std, best, xi=0.01):
+    z = (mean - best - xi) / std
+    cdf = 0.5 * (1 + np.vectorize(math.erf)(z / math.sqrt(2)))
+    pdf = np.exp(-0.5 * z * z) / math.sqrt(2 * math.pi)
+    return (mean - best - xi) * cdf + std * pdf
@@ -0,0 +1,109 @@
+import multiprocessing
+from multiprocessing import shared_memory
+import numpy as np
+from maps import as_map
+from headless import WIDTH, HEIGHT, NUM_BOIDS, SIM_STEPS, K_WALL, MAX_ACCEL
+from result_cache import cached_run_coverage
+
+# handles whose mapping could not be closed yet because the parent still holds views into it
+_unclosed = []
+# the maps of the current run_shared_heatmaps call, installed once per pool worker by load_worker_maps so
+# jobs only carry a slot index where the map would be
+worker_maps = None
+# per-process attachments, so a pool worker maps each block once however many jobs it runs.
+# Holds one block at most: attaching to another closes the last one, whose segment the parent may have unlinked
+_attached = {}
+
+
+class SharedHeatmaps:
+    """(slots, seeds, height, width) uint32 visit-frequency block in shared memory.
+
+    The parent creates it, pool workers attach by `spec` and write each run's heatmap straight
+    into its [slot, seed] plane, and the parent reads the results through `array` as zero-copy
+    views. A slot is one (map, gain vector) pair. Use as a context manager, or call release(),
+    to free the segment.
+    """
+
+    def __init__(self, num_slots, num_seeds, height=HEIGHT, width=WIDTH):
+        self.shape = (num_slots, num_seeds, height, width)
+        self.shm = shared_memory.SharedMemory(create=True, size=max(int(np.prod(self.shape)) * 4, 1))
+        self.array = _view(self.shm, self.shape)
+
+    @property
+    def spec(self):
+        """Picklable (name, shape) that attach() turns back into the array in another process."""
+        return self.shm.name, self.shape
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.release()
+
+    def release(self):
+        self.array = None
+        self.shm.unlink()
+        _unclosed.append(self.shm)
+        for shm in list(_unclosed):
+            try:
+                shm.close()
+            except BufferError:
+                # views handed out by `array` are still alive; try again on the next release
+                continue
+            _unclosed.remove(shm)
+
+
+def attach(spec):
+    name, shape = spec
+    if name not in _attached:
+        # jobs of the previous block are done by now, since run_shared_heatmaps waits for a whole block
+        detach()
+        shm = shared_memory.SharedMemory(name=name)
+        _attached[name] = shm, _view(shm, shape)
+    return _attached[name][1]
+
+
+def detach():
+    """Close every block this process attached to."""
+    while _attached:
+        _, (shm, view) = _attached.popitem()
+        del view  # release the buffer export before unmapping
+        shm.close()
+
+
+def _view(shm, shape):
+    # frombuffer holds a buffer export on shm.buf, so close() refuses to unmap under live views
+    return np.frombuffer(shm.buf, dtype=np.uint32, count=int(np.prod(shape))).reshape(shape)
+
+
+def load_worker_maps(maps):
+    global worker_maps
+    worker_maps = maps
+
+
+def _run_into_slot(args):
+    spec, slot, index, gains, seed, num_boids, steps, k_wall, max_accel = args
+    out = attach(spec)[slot, index]
+    coverage_over_time, _ = cached_run_coverage(worker_maps[slot], gains, seed, num_boids, steps, k_wall, max_accel, out=out)
+    return slot, seed, coverage_over_time
+
+
+def run_shared_heatmaps(block, runs, seeds, num_boids=NUM_BOIDS, steps=SIM_STEPS, k_wall=K_WALL,
+                        max_accel=MAX_ACCEL):
+    """Run every (obstacles, gains) pair in `runs` for every seed, in parallel, into block's slots.
+
+    Run i, seed j lands in block.array[i, j]; only coverage curves come back through the pool.
+    The maps go to each worker once, when the pool starts, and jobs name them by slot. Returns
+    a list with a {seed: coverage_over_time} dict per run.
+    """
+    maps = [as_map(obstacles, width=WIDTH, height=HEIGHT) for obstacles, _ in runs]
+    jobs = [(block.spec, slot, index, tuple(gains), seed, num_boids, steps, k_wall, max_accel)
+            for slot, (_, gains) in enumerate(runs) for index, seed in enumerate(seeds)]
+    workers = max(1, min(len(jobs), multiprocessing.cpu_count() or 1))
+    with multiprocessing.Pool(workers, initializer=load_worker_maps, initargs=(maps,)) as pool:
+        finished = pool.map(_run_into_slot, jobs)
+
+    curves = [{} for _ in runs]
+    for slot, seed, coverage_over_time in finished:
+        curves[slot][seed] = coverage_over_time
+    return curves
@@ -0,0 +1,39 @@
+import numpy as np
+from coverage_grid import CoverageGrid, coverage_uniformity_batch, coverage_uniformity, screen_to_free_percent
+from headless import WIDTH, HEIGHT
+
+# Uniformity statistics against plain numpy: python -m pytest test_coverage_grid.py (or python test_coverage_grid.py).
+# Visit counts of up to 30000 per pixel on a whole free screen, where n * sum(v^2) - sum(v)^2 no longer fits in int64.
+
+
+def test_uniformity_matches_numpy_on_large_counts():
+    rng = np.random.default_rng(0)
+    heatmaps = rng.integers(0, 30000, (2, 3, HEIGHT, WIDTH)).astype(np.uint32)
+    free = np.ones((HEIGHT, WIDTH), dtype=bool)
+    free[100:200, 300:500] = False
+    variances, means, stds, cvs = coverage_uniformity_batch(heatmaps, free, chunk_size=4)
+    values = heatmaps[..., free].astype(np.float64)
+    assert np.allclose(variances, values.var(axis=-1, ddof=1), rtol=1e-9)
+    assert np.allclose(means, values.mean(axis=-1), rtol=1e-12)
+    assert np.allclose(stds, values.std(axis=-1, ddof=1), rtol=1e-9)
+    assert np.allclose(cvs, stds / means)
+
+    variance, mean, std_dev = coverage_uniformity(heatmaps[1, 2], free)
+    assert np.isclose(variance, values[1, 2].var(ddof=1), rtol=1e-9)
+
+
+def test_free_space_percent_counts_free_pixels():
+    free = np.ones((HEIGHT, WIDTH), dtype=bool)
+    free[:, :WIDTH // 2] = False
+    grid = CoverageGrid(free, 2)
+    grid.stamp(np.random.default_rng(1).uniform((0, 0), (WIDTH, HEIGHT), (500, 2)))
+    assert grid.num_visited == grid.visited.sum() and not grid.visited[~free].any()
+    assert np.isclose(grid.free_space_percent(), grid.num_visited / free.sum() * 100)
+    assert np.isclose(grid.free_space_percent(), 2 * grid.coverage_percent())
+    assert np.isclose(screen_to_free_percent(grid.coverage_percent(), free), grid.free_space_percent())
+
+
+if __name__ == "__main__":
+    test_uniformity_matches_numpy_on_large_counts()
+    test_free_space_percent_counts_free_pixels()
+    print("uniformity matches numpy")
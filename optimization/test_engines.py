@@ -0,0 +1,83 @@
+import importlib.util
+import numpy as np
+import headless
+from engines import ENGINES, compare_engines, available_engines
+from headless import spawn_flock, FLOCK_PARAMS, K_WALL, MAX_ACCEL
+from boids_opt import Boid, Obstacle
+from boids_opt import create_dense_cafeteria_obstacles, create_narrow_corridor_obstacles, create_no_obstacles
+
+# Trajectory equivalence of every installed engine against the reference engine, and of the reference and numpy
+# engines against boids_opt.Boid.update: python -m pytest test_engines.py (or python test_engines.py). The numba
+# engine is checked whenever numba can be imported.
+
+NUMBA_INSTALLED = importlib.util.find_spec("numba") is not None
+TOLERANCE = 1e-6
+MAPS = (create_no_obstacles, create_dense_cafeteria_obstacles, create_narrow_corridor_obstacles)
+GAINS = [(0.2, 0.05, 0.3), (0.01, 0.09, 0.05)]
+SPEC_FRAMES = 5
+
+
+def step_boids(boids, obstacles, gains):
+    """One frame of boids_opt.Boid.update, every boid reading the flock as it was when the frame started."""
+    frozen = []
+    for boid in boids:
+        copy = Boid()
+        copy.position.update(boid.position)
+        copy.velocity.update(boid.velocity)
+        frozen.append(copy)
+    for i, boid in enumerate(boids):
+        # The boid itself stands in for its own snapshot, so update still skips it as a neighbor
+        boid.update(frozen[:i] + [boid] + frozen[i + 1:], obstacles, *gains, K_WALL, MAX_ACCEL)
+
+
+def test_engines_match_reference():
+    assert "numpy" in available_engines()
+    assert ("numba" in available_engines()) == NUMBA_INSTALLED
+    for create in MAPS:
+        game_map = create()
+        for gains in GAINS:
+            start = spawn_flock(game_map, 100, 27, "numpy")
+            deviations = compare_engines(start.positions, start.velocities, game_map, gains, **FLOCK_PARAMS)
+            assert set(deviations) == ({"numpy", "numba"} if NUMBA_INSTALLED else {"numpy"})
+            for name, deviation in deviations.items():
+                assert deviation <= TOLERANCE, f"{name} on {game_map.name} {gains}: max |dx| = {deviation:.3g}"
+
+
+def test_engines_match_boid_update():
+    for create in MAPS:
+        game_map = create()
+        obstacles = [Obstacle((obs.position.x, obs.position.y), obs.size, obs.shape) for obs in game_map.records()]
+        for gains in GAINS:
+            start = spawn_flock(game_map, 100, 27, "numpy")
+            boids = []
+            for (x, y), (vx, vy) in zip(start.positions.tolist(), start.velocities.tolist()):
+                boid = Boid()
+                boid.position.update(x, y)
+                boid.velocity.update(vx, vy)
+                boids.append(boid)
+            engines = {name: ENGINES[name](start.positions, start.velocities, game_map, **FLOCK_PARAMS)
+                       for name in ("reference", "numpy")}
+            for frame in range(SPEC_FRAMES):
+                step_boids(boids, obstacles, gains)
+                expected = np.array([tuple(boid.position) for boid in boids])
+                for name, engine in engines.items():
+                    engine.step(*gains, K_WALL, MAX_ACCEL)
+                    deviation = np.abs(engine.positions - expected).max()
+                    assert deviation <= TOLERANCE, (f"{name} on {game_map.name} {gains}, frame {frame}: "
+                                                    f"max |dx| = {deviation:.3g}")
+
+
+def test_engine_setting_read_when_called():
+    saved = headless.ENGINE
+    try:
+        headless.ENGINE = "reference"
+        assert type(spawn_flock(create_no_obstacles(), 5, 27)).__name__ == "ReferenceFlock"
+    finally:
+        headless.ENGINE = saved
+
+
+if __name__ == "__main__":
+    test_engines_match_reference()
+    test_engines_match_boid_update()
+    test_engine_setting_read_when_called()
+    print("engines match the reference")
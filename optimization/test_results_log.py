@@ -0,0 +1,50 @@
+import os
+import tempfile
+from results_log import ResultLog, result_key
+from boids_opt import NUM_BOIDS, SIM_STEPS, SEEDS, draw_gain_vectors, pending_gain_vectors, choose_search_seed
+
+# Resuming an interrupted search from its result log, including a row torn by a crash mid-write:
+# python -m pytest test_results_log.py (or python test_results_log.py)
+
+MAP_NAME = "test_map"
+SEARCH_SEED = 1234
+NUM_VECTORS = 4
+
+
+def log_results(log, gain_vectors):
+    log.append(MAP_NAME, NUM_BOIDS, SIM_STEPS, [(gv, seed, 10.0 + seed) for gv in gain_vectors for seed in SEEDS],
+               SEARCH_SEED)
+
+
+def keys(gain_vectors):
+    return {result_key(MAP_NAME, NUM_BOIDS, SIM_STEPS, gv, seed) for gv in gain_vectors for seed in SEEDS}
+
+
+def test_resume_after_torn_row():
+    vectors = draw_gain_vectors(SEARCH_SEED, NUM_VECTORS)
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "log.csv")
+        log_results(ResultLog(path), vectors[:2])
+        # A crash inside the last field of a row for the third vector: it still parses, with search_seed 123
+        with open(path, "a", newline="") as f:
+            f.write(f"{MAP_NAME},{NUM_BOIDS},{SIM_STEPS},{','.join(repr(g) for g in vectors[2])},{SEEDS[0]},"
+                    f"12.5,{SIM_STEPS},{str(SEARCH_SEED)[:-1]}")
+
+        log = ResultLog(path)
+        assert log.completed_keys() == keys(vectors[:2])
+        assert choose_search_seed(log, MAP_NAME, NUM_VECTORS) == SEARCH_SEED
+        assert pending_gain_vectors(log, MAP_NAME, SEARCH_SEED, NUM_VECTORS) == vectors[2:]
+
+        log_results(log, vectors[2:3])
+        with open(path) as f:
+            lines = f.read().split("\n")
+        assert lines[-1] == ""
+        assert len(lines) == 2 + 3 * len(SEEDS)  # header, three vectors' rows, and the final newline
+        assert all(line.count(",") == 9 for line in lines[:-1])  # nothing merged into the torn line
+        assert log.completed_keys() == keys(vectors[:3])
+        assert pending_gain_vectors(log, MAP_NAME, SEARCH_SEED, NUM_VECTORS) == vectors[3:]
+
+
+if __name__ == "__main__":
+    test_resume_after_torn_row()
+    print("result log resumes after a torn row")
@@ -0,0 +1,56 @@
+import numpy as np
+
+
+class Trails:
+    """The last `length` positions of every boid, in one preallocated (N, length, 2) ring buffer.
+
+    push() writes the whole flock into the oldest slot and advances the head index, so keeping
+    trails costs one (N, 2) copy per frame and allocates nothing. Rendering and the path
+    analyses read the same buffer. With length 0 the buffer is empty and push() returns
+    straight away.
+    """
+
+    def __init__(self, num_boids, length):
+        self.length = length
+        self.buffer = np.zeros((num_boids, length, 2))
+        self.head = 0   # slot the next push() overwrites
+        self.count = 0  # filled slots, up to length
+
+    def push(self, positions):
+        if self.length == 0:
+            return
+        self.buffer[:, self.head] = positions
+        self.head = (self.head + 1) % self.length
+        self.count = min(self.count + 1, self.length)
+
+    def clear(self):
+        self.head = 0
+        self.count = 0
+
+    def points(self):
+        """(N, count, 2) trail points, oldest first, or None before the first push."""
+        if self.count == 0:
+            return None
+        if self.count < self.length or self.head == 0:
+            return self.buffer[:, :self.count]  # not wrapped yet, already in order
+        return np.concatenate([self.buffer[:, self.head:], self.buffer[:, :self.head]], axis=1)
+
+    def path_length(self):
+        """(N,) distance travelled along each trail."""
+        points = self.points()
+        if points is None:
+            return np.zeros(len(self.buffer))
+        return np.sqrt((np.diff(points, axis=1) ** 2).sum(axis=2)).sum(axis=1)
+
+    def tortuosity(self):
+        """(N,) path length over the straight-line distance from the oldest to the newest point.
+
+        1 for a straight trail and growing as it winds; inf for a trail that ends where it
+        started, NaN for one that has not moved.
+        """
+        points = self.points()
+        if points is None:
+            return np.full(len(self.buffer), np.nan)
+        chord = np.sqrt(((points[:, -1] - points[:, 0]) ** 2).sum(axis=1))
+        with np.errstate(divide="ignore", invalid="ignore"):
+            return self.path_length() / chord
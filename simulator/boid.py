@@ -1,10 +1,13 @@
 import numpy as np
-import pygame
 from pygame import Vector2   # Library for creating windows, rendering graphics, user input, frame rates
 import math
 import random
 
 class Boid:
+    # No per-instance __dict__, a boid is a fixed set of fields
+    __slots__ = ("position", "velocity", "acceleration", "max_speed", "max_force", "perception_radius", "avoidance_radius",
+                 "screen_width", "screen_height", "field_of_view", "size", "color")
+
     def __init__(self, x, y, screen_width, screen_height):
         # Position and velocity vectors
         self.position = Vector2(x, y)
@@ -31,8 +34,9 @@ class Boid:
         self.size = 8   ## Size of the boid, in pixels. So boids will avoid other boids within 3 times this size, and perceive other boids within 6 times this size
         self.color = (255, 255, 255) # White boids 
 
-    def apply_behavior(self, boids, cohesion_weight, alignment_weight, separation_weight, target=None, obstacles=None):
-        """Apply all three boid behaviors and optional target following with prioritized acceleration allocation"""
+    def apply_behavior(self, boids, cohesion_weight, alignment_weight, separation_weight, target=None, obstacles=None, distance_field=None):
+        """Apply all three boid behaviors and optional target following with prioritized acceleration allocation.
+        If a DistanceField is given, obstacle avoidance reads it instead of looping over the obstacles list"""
         # Prioritize behaviors in this order:
         # 1. Obstacle avoidance (highest priority)
         # 2. Separation / collision avoidance
@@ -47,17 +51,13 @@ class Boid:
         # Track how much acceleration has been allocated, each behavior will add its contribution to this vector
         allocated = Vector2(0, 0)
         
-        # Initialize all force vectors
-        avoidance_force = Vector2(0, 0)
-        separation_force = Vector2(0, 0)
-        alignment_force = Vector2(0, 0)
-        cohesion_force = Vector2(0, 0)
-        seek_force = Vector2(0, 0)
-        
         # 1. Obstacle avoidance (highest priority)
-        if obstacles:
+        if distance_field is not None or obstacles:
             avoidance_gain = 2
-            avoidance_force = self.avoid_obstacles(obstacles) * avoidance_gain
+            if distance_field is not None:
+                avoidance_force = self.avoid_distance_field(distance_field) * avoidance_gain
+            else:
+                avoidance_force = self.avoid_obstacles(obstacles) * avoidance_gain
             force_magnitude = avoidance_force.length()
             
             # If force exceeds remaining acceleration, scale it down
@@ -151,8 +151,8 @@ class Boid:
         # Update position
         self.position += self.velocity
         
-        # Reset acceleration to zero for the next frame
-        self.acceleration = Vector2(0, 0)
+        # Reset acceleration to zero for the next frame, in place rather than allocating a new vector
+        self.acceleration.update(0, 0)
         
         # Wrap around screen edges to keep the boids visible, or we cna use a border so we treat it as an obstacle that the boids need to avoid?
         self.position.x = self.position.x % self.screen_width
@@ -322,6 +322,48 @@ class Boid:
         
         return steering
     
+    def avoid_distance_field(self, field):
+        """Steer to avoid the nearest obstacle surface, with the same three ranges as avoid_obstacle.
+        Distances are to the exact surface, so long rectangles are avoided along their edges rather than by a bounding circle"""
+        distance, gx, gy = (float(v[0]) for v in field.sample_many([self.position.x], [self.position.y]))
+        
+        # Nothing within perception radius and not about to hit anything, the common case away from obstacles
+        if distance >= self.perception_radius and distance >= self.size + self.max_speed * 1.5:
+            return Vector2(0, 0)
+        
+        # The gradient points away from the nearest surface. It vanishes where two surfaces are equally close, such as the center of a circle
+        away = Vector2(gx, gy)
+        if away.length() == 0:
+            away = Vector2(random.uniform(-1, 1), random.uniform(-1, 1))
+            if away.length() == 0:
+                return Vector2(0, 0)
+        away.normalize_ip()
+        
+        # If close to collision, strong repulsion
+        if distance < self.size:
+            avoiding_force_gain = 5.0
+            return away * self.max_force * avoiding_force_gain
+        
+        # Predict future position based on current velocity, and steer around the obstacle if it would be inside one
+        look_ahead_time = 1.5
+        future_pos = self.position + self.velocity * look_ahead_time
+        future_distance = float(field.sample_many([future_pos.x], [future_pos.y])[0][0])
+        
+        if future_distance < self.size:
+            perpendicular = Vector2(away.y, -away.x)  # Along the surface
+            if perpendicular.dot(self.velocity) < 0:  # Not aligned with current direction, flip that
+                perpendicular = -perpendicular
+            strength = self.perception_radius / max(distance, 0.1)   # Stronger the closer we are to the surface
+            force_magnitude = min(strength * self.max_force * 3, self.max_force * 5)
+            return perpendicular * force_magnitude
+        
+        # Default - mild repulsion if in perceptive range not colliding, fading to zero at the perception radius
+        if distance < self.perception_radius:
+            strength = self.max_force * 6 * (1.0 - distance / self.perception_radius)
+            return away * strength
+        
+        return Vector2(0, 0)
+    
     def can_perceive(self, other_boid):
         """Check if another boid is within perception radius and field of view"""
         # Calculate distance
@@ -354,32 +396,3 @@ class Boid:
         
         # Check if angle is within field of view (Ex. With 180 degrees field of view, we need the other boid to be within 90 degrees of the forward direction on either side)
         return angle <= self.field_of_view / 2
-    
-    def draw(self, screen):
-        """Render the boid on screen as a triangle"""
-        # Calculate the angle of the velocity vector
-        if self.velocity.length() > 0:
-            angle = math.atan2(self.velocity.y, self.velocity.x)
-        else:   # If boid is not moving, set angle to 0
-            angle = 0
-            
-        # Triangle points representing the boid
-        points = [
-            # Nose (front)
-            (self.position.x + self.size * math.cos(angle),
-             self.position.y + self.size * math.sin(angle)),
-            # Left wing
-            (self.position.x + self.size * 0.7 * math.cos(angle + 2.5),  # 2.5 radians / 143 degrees was chosen just for nice arrow like shapes
-             self.position.y + self.size * 0.7 * math.sin(angle + 2.5)),
-            # Right wing
-            (self.position.x + self.size * 0.7 * math.cos(angle - 2.5),
-             self.position.y + self.size * 0.7 * math.sin(angle - 2.5))
-        ]
-        
-        # Draw the boid as a triangle
-        pygame.draw.polygon(screen, self.color, points)
-        
-        # Optional: Visualize perception radius (for debugging)
-        # pygame.draw.circle(screen, (100, 100, 100), 
-        #                   (int(self.position.x), int(self.position.y)), 
-        #                   self.perception_radius, 1)
\ No newline at end of file
@@ -1,5 +1,6 @@
 from simulation import FlockSimulation
 import pygame
+import sys
 
 def main():
     """Entry point for the boid simulation"""
@@ -11,6 +12,7 @@ def main():
     # Standard resolution, can be adjusted as needed
     width, height = 1280, 720
     num_boids = 150  # Initial number of boids to simulate
+    use_worker = "--worker" in sys.argv  # Run the physics in a background process, the window only draws
     
     # Set window position (centered)
     os.environ['SDL_VIDEO_CENTERED'] = '1'
@@ -25,9 +27,12 @@ def main():
     print("Sliders: Adjust behavior parameters and boid count")
     print("Reset Button: Reset boid positions")
     print("Clear Obstacles Button: Remove all obstacles")
+    print("+/-: Double or halve simulation speed, T: Toggle turbo mode (render every 10th step)")
+    print("F3: Toggle frame profiler overlay, F4: Export frame timings to CSV")
+    print("Start with --worker to run the simulation in a background process")
     
     # Start simulation
-    simulation = FlockSimulation(width, height, num_boids)
+    simulation = FlockSimulation(width, height, num_boids, use_worker)
     simulation.run()
 
 if __name__ == "__main__":
@@ -1,6 +1,7 @@
 import pygame
 from pygame import Vector2
 import numpy as np
+import math
 
 class Obstacle:
     """Base class for obstacles in the simulation"""
@@ -60,41 +61,231 @@ class RectObstacle(Obstacle):
         """Check if a point is within the rectangle"""
         return self.rect.collidepoint(point)   # Pygame has built-in method for this, check if the point's x coordinate is b/w the rectangle's left and right edges, and if the y coordinate is b/w the rectangle's top and bottom edges
 
+class ObstacleGrid:
+    """Uniform grid over obstacle bounding circles, so range queries only look at obstacles in the cells they touch"""
+    def __init__(self, cell_size=100):
+        self.cell_size = float(cell_size)  # About the query radius of a boid (twice its perception radius), so a query touches 3x3 cells or fewer
+        self.cells = {}                    # (column, row) -> list of obstacles whose bounding circle overlaps that cell
+        self.entries = {}                  # Obstacle -> (insertion number, cells it was added to)
+        self.count = 0                     # Insertion counter, so query results come back in insertion order
+    
+    def cell_range(self, x, y, radius):
+        """All cells overlapped by the square around (x, y) with half side radius"""
+        size = self.cell_size
+        return [(cx, cy)
+                for cy in range(math.floor((y - radius) / size), math.floor((y + radius) / size) + 1)
+                for cx in range(math.floor((x - radius) / size), math.floor((x + radius) / size) + 1)]
+    
+    def insert(self, obstacle):
+        """Add an obstacle to every cell its bounding circle overlaps"""
+        # One pixel of slack, because pygame.Rect truncates a RectObstacle's corners to whole pixels
+        cells = self.cell_range(obstacle.position.x, obstacle.position.y, obstacle.radius + 1)
+        for cell in cells:
+            self.cells.setdefault(cell, []).append(obstacle)
+        self.entries[obstacle] = (self.count, cells)
+        self.count += 1
+    
+    def remove(self, obstacle):
+        """Take an obstacle out of the cells it was added to"""
+        _, cells = self.entries.pop(obstacle)
+        for cell in cells:
+            bucket = self.cells[cell]
+            bucket.remove(obstacle)
+            if not bucket:
+                del self.cells[cell]   # Drop empty cells so the dict only holds occupied ones
+    
+    def clear(self):
+        """Remove every obstacle"""
+        self.cells.clear()
+        self.entries.clear()
+        self.count = 0
+    
+    def query(self, x, y, radius):
+        """Obstacles whose bounding circle comes within radius of (x, y), in insertion order"""
+        # Two circles that overlap share a point, and that point's cell is in both cell ranges, so no obstacle is missed
+        found = {}
+        for cell in self.cell_range(x, y, radius):
+            bucket = self.cells.get(cell)
+            if bucket is None:
+                continue
+            for obstacle in bucket:
+                if obstacle not in found and math.hypot(x - obstacle.position.x, y - obstacle.position.y) < radius + obstacle.radius:
+                    found[obstacle] = self.entries[obstacle][0]
+        if len(found) < 2:
+            return list(found)
+        return sorted(found, key=found.get)   # Same order as the obstacle list, so avoidance forces add up the same way
+    
+    def at(self, x, y):
+        """Obstacles whose bounding circle could contain the point (x, y)"""
+        return self.cells.get((math.floor(x / self.cell_size), math.floor(y / self.cell_size)), [])
+
+class DistanceField:
+    """Signed distance to the nearest obstacle surface and its gradient, sampled on a regular grid over the screen.
+    Negative inside obstacles. Only the area around an obstacle is recomputed when it is added or removed"""
+    def __init__(self, width, height, step=4, max_distance=150):
+        self.step = float(step)                    # Pixels between grid nodes
+        self.max_distance = float(max_distance)    # Distances are clamped here, as far as a boid looks ahead for obstacles (3x perception radius)
+        self.columns = int(math.ceil(width / step)) + 1
+        self.rows = int(math.ceil(height / step)) + 1
+        self.xs = np.arange(self.columns) * self.step   # Pixel coordinates of the grid nodes
+        self.ys = np.arange(self.rows) * self.step
+        self.distance = np.full((self.rows, self.columns), self.max_distance)
+        self.gradient = np.zeros((self.rows, self.columns, 2))   # d(distance)/dx, d(distance)/dy, a unit vector pointing away from the nearest surface
+    
+    def reach(self, obstacle):
+        """Grid window (row0, row1, col0, col1) an obstacle can change: its bounding box grown by max_distance"""
+        left, top, right, bottom = bounds(obstacle)
+        pad = self.max_distance + self.step
+        col0 = max(0, int((left - pad) // self.step))
+        col1 = min(self.columns, int((right + pad) // self.step) + 2)
+        row0 = max(0, int((top - pad) // self.step))
+        row1 = min(self.rows, int((bottom + pad) // self.step) + 2)
+        return row0, row1, col0, col1
+    
+    def influence(self, obstacle):
+        """Radius around an obstacle's center that holds every obstacle able to change a node in its reach window"""
+        # The window spans at most radius + max_distance + 3 steps each way, others count within max_distance of it,
+        # and the circle around that square is sqrt(2) times its half side. One more pixel for pygame.Rect rounding
+        return math.sqrt(2) * (obstacle.radius + 2 * self.max_distance + 3 * self.step) + 1
+    
+    def add(self, obstacle):
+        """Merge one obstacle into the field"""
+        window = self.reach(obstacle)
+        row0, row1, col0, col1 = window
+        if row0 >= row1 or col0 >= col1:   # Entirely off screen
+            return
+        area = self.distance[row0:row1, col0:col1]
+        np.minimum(area, signed_distance(obstacle, self.xs[col0:col1], self.ys[row0:row1]), out=area)
+        self.refresh(window)
+    
+    def remove(self, obstacle, obstacles):
+        """Take one obstacle out of the field, recomputing its window from the remaining obstacles (or just those near it)"""
+        window = self.reach(obstacle)
+        row0, row1, col0, col1 = window
+        if row0 >= row1 or col0 >= col1:
+            return
+        area = self.distance[row0:row1, col0:col1]
+        area.fill(self.max_distance)
+        left, top, right, bottom = self.xs[col0], self.ys[row0], self.xs[col1 - 1], self.ys[row1 - 1]
+        for other in obstacles:
+            o_left, o_top, o_right, o_bottom = bounds(other)
+            # Only obstacles within max_distance of the window can bring a node in it below max_distance
+            if (o_right + self.max_distance >= left and o_left - self.max_distance <= right
+                    and o_bottom + self.max_distance >= top and o_top - self.max_distance <= bottom):
+                np.minimum(area, signed_distance(other, self.xs[col0:col1], self.ys[row0:row1]), out=area)
+        self.refresh(window)
+    
+    def clear(self):
+        """Reset to an empty map"""
+        self.distance.fill(self.max_distance)
+        self.gradient.fill(0.0)
+    
+    def refresh(self, window):
+        """Recompute the gradient over a changed window"""
+        row0, row1, col0, col1 = window
+        # Central differences at the window edge read one node beyond it, and the nodes just outside see the change too
+        row0, row1 = max(0, row0 - 1), min(self.rows, row1 + 1)
+        col0, col1 = max(0, col0 - 1), min(self.columns, col1 + 1)
+        ext_row0, ext_row1 = max(0, row0 - 1), min(self.rows, row1 + 1)
+        ext_col0, ext_col1 = max(0, col0 - 1), min(self.columns, col1 + 1)
+        gy, gx = np.gradient(self.distance[ext_row0:ext_row1, ext_col0:ext_col1], self.step)
+        inner = (slice(row0 - ext_row0, row1 - ext_row0), slice(col0 - ext_col0, col1 - ext_col0))
+        self.gradient[row0:row1, col0:col1, 0] = gx[inner]
+        self.gradient[row0:row1, col0:col1, 1] = gy[inner]
+    
+    def sample_many(self, x, y):
+        """Bilinear distance, gx and gy at arrays of pixel coordinates (x, y), clamped to the screen"""
+        fx = np.clip(np.asarray(x) / self.step, 0.0, self.columns - 1.000001)
+        fy = np.clip(np.asarray(y) / self.step, 0.0, self.rows - 1.000001)
+        col, row = fx.astype(np.int64), fy.astype(np.int64)
+        tx, ty = fx - col, fy - row
+        wa, wb, wc, wd = (1 - tx) * (1 - ty), tx * (1 - ty), (1 - tx) * ty, tx * ty
+        a, b = self.distance[row, col], self.distance[row, col + 1]
+        c, d = self.distance[row + 1, col], self.distance[row + 1, col + 1]
+        distance = wa * a + wb * b + wc * c + wd * d
+        a, b = self.gradient[row, col], self.gradient[row, col + 1]
+        c, d = self.gradient[row + 1, col], self.gradient[row + 1, col + 1]
+        gradient = wa[:, None] * a + wb[:, None] * b + wc[:, None] * c + wd[:, None] * d
+        return distance, gradient[:, 0], gradient[:, 1]
+
+def bounds(obstacle):
+    """Bounding box (left, top, right, bottom) of an obstacle's exact shape"""
+    if isinstance(obstacle, RectObstacle):
+        return obstacle.rect.left, obstacle.rect.top, obstacle.rect.right, obstacle.rect.bottom
+    x, y, r = obstacle.position.x, obstacle.position.y, obstacle.radius
+    return x - r, y - r, x + r, y + r
+
+def signed_distance(obstacle, xs, ys):
+    """Exact signed distance from every (y, x) grid node to an obstacle's surface, negative inside"""
+    if isinstance(obstacle, RectObstacle):
+        # Distance to a box: per axis overshoot beyond the half extents, measured from the rectangle pygame actually draws
+        rect = obstacle.rect
+        qx = np.abs(xs - (rect.left + rect.width / 2)) - rect.width / 2
+        qy = np.abs(ys - (rect.top + rect.height / 2)) - rect.height / 2
+        qx, qy = np.broadcast_arrays(qx[None, :], qy[:, None])
+        outside = np.hypot(np.maximum(qx, 0), np.maximum(qy, 0))
+        inside = np.minimum(np.maximum(qx, qy), 0)
+        return outside + inside
+    return np.hypot(xs[None, :] - obstacle.position.x, ys[:, None] - obstacle.position.y) - obstacle.radius
+
 class ObstacleManager:
     """Manages all obstacles in the simulation"""
-    def __init__(self):
+    def __init__(self, width=1280, height=720):
         self.obstacles = []   # Initialize an empty list to store obstacles
+        self.grid = ObstacleGrid()   # Spatial index over the same obstacles, kept in step with the list
+        self.distance_field = DistanceField(width, height)   # Signed distance to the nearest obstacle, used for avoidance
+        self.layer = None             # Background with every obstacle drawn on it, rebuilt only after the obstacles change
+        self.layer_version = 0        # Bumped on every rebuild, so the renderer knows when to push the whole screen
     
     def add_obstacle(self, obstacle):
         """Add an obstacle to the simulation"""
         self.obstacles.append(obstacle)
+        self.grid.insert(obstacle)
+        self.distance_field.add(obstacle)
+        self.layer = None
     
     def remove_obstacle(self, obstacle):
         """Remove an obstacle from the simulation"""
         if obstacle in self.obstacles:
             self.obstacles.remove(obstacle)
+            self.grid.remove(obstacle)
+            # Only obstacles the grid finds near the removed one can show up in its window
+            nearby = self.get_obstacles_near(obstacle.position, self.distance_field.influence(obstacle))
+            self.distance_field.remove(obstacle, nearby)
+            self.layer = None
     
     def remove_all(self):
         """Clear all obstacles"""
         self.obstacles.clear()
+        self.grid.clear()
+        self.distance_field.clear()
+        self.layer = None
     
     def draw_all(self, screen):
         """Draw all obstacles"""
         for obstacle in self.obstacles:
             obstacle.draw(screen)
     
+    def get_layer(self, size, background):
+        """Background color with all obstacles pre-rendered, cached until an obstacle is added or removed"""
+        if self.layer is None or self.layer.get_size() != size:
+            self.layer = pygame.Surface(size).convert()  # Same pixel format as the screen, so blits are plain copies
+            self.layer.fill(background)
+            self.draw_all(self.layer)
+            self.layer_version += 1
+        return self.layer
+    
     def check_point_collision(self, point):
         """Check if a point collides with any obstacle"""
-        for obstacle in self.obstacles:
+        x, y = point
+        for obstacle in self.grid.at(x, y):   # Only obstacles sharing the point's grid cell can contain it
             if obstacle.check_collision(point):
                 return True
         return False
     
     def get_obstacles_near(self, position, radius):
         """Get all obstacles within sum of the query radius and obstacle radius"""
-        nearby = []
-        for obstacle in self.obstacles:
-            dist = Vector2(position).distance_to(obstacle.position)
-            if dist < radius + obstacle.radius:  # Use the query radius (right now set to twice the perception radius and obstacle's own radius
-                nearby.append(obstacle)  # Boid would need to avoid this obstacle if it is within the this radius, mimicing boid's far vision
-        return nearby
\ No newline at end of file
+        # Use the query radius (right now set to twice the perception radius) and obstacle's own radius
+        # Boid would need to avoid these obstacles, mimicing boid's far vision
+        x, y = position
+        return self.grid.query(x, y, radius)
\ No newline at end of file
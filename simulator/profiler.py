@@ -0,0 +1,103 @@
+import csv
+import time
+from collections import deque
+import numpy as np
+import pygame
+
+class FrameProfiler:
+    """Per-phase frame timers with rolling percentiles, an on-screen overlay and CSV export"""
+    # Phases in the order they run in a frame, also the row order of the overlay and the columns of the export
+    PHASES = ("events", "boid_count", "neighborhoods", "apply_behavior", "boid_update",
+              "background", "draw_target", "draw_boids", "draw_ui", "draw_preview", "display")
+    PERCENTILES = (50, 95, 99)
+
+    def __init__(self, window=240, history=36000):
+        self.enabled = False                                           # Timers are skipped entirely while disabled
+        self.window = window                                           # Number of frames the rolling percentiles cover (4 seconds at 60 FPS)
+        self.samples = {phase: deque(maxlen=window) for phase in self.PHASES + ("frame",)}  # Rolling per-phase milliseconds
+        self.history = deque(maxlen=history)                           # Every profiled frame since enabling, for export (10 minutes at 60 FPS)
+        self.frame = dict.fromkeys(self.PHASES, 0.0)                   # Seconds spent in each phase this frame
+        self.started = {}                                              # Start time of each phase that is currently running
+        self.frame_start = 0.0
+        self.font = None                                               # Monospace font for the overlay, loaded on first draw
+        self.panel = None                                              # Rendered overlay, redrawn a few times per second
+        self.frames_since_panel = 0
+
+    def toggle(self):
+        """Turn profiling and the overlay on or off. Rolling samples restart on every enable"""
+        self.enabled = not self.enabled
+        if self.enabled:
+            for samples in self.samples.values():
+                samples.clear()
+            self.panel = None
+            self.begin_frame()
+
+    def begin_frame(self):
+        """Mark the start of a frame, before event handling"""
+        if not self.enabled:
+            return
+        self.frame = dict.fromkeys(self.PHASES, 0.0)
+        self.frame_start = time.perf_counter()
+
+    def start(self, phase):
+        """Start timing a phase"""
+        if self.enabled:
+            self.started[phase] = time.perf_counter()
+
+    def stop(self, phase):
+        """Stop timing a phase. A phase started and stopped several times in one frame adds up"""
+        if self.enabled:
+            self.frame[phase] += time.perf_counter() - self.started.pop(phase, self.frame_start)
+
+    def end_frame(self):
+        """Close the frame, after the display flip and before the clock waits for the next frame"""
+        if not self.enabled:
+            return
+        total = time.perf_counter() - self.frame_start
+        for phase, seconds in self.frame.items():
+            self.samples[phase].append(seconds * 1000)
+        self.samples["frame"].append(total * 1000)
+        self.history.append((total, *(self.frame[phase] for phase in self.PHASES)))
+
+    def percentiles(self, phase):
+        """Rolling p50/p95/p99 of a phase in milliseconds, or None before the first sample"""
+        samples = self.samples[phase]
+        if not samples:
+            return None
+        return np.percentile(np.fromiter(samples, dtype=float, count=len(samples)), self.PERCENTILES)
+
+    def draw(self, screen, fps):
+        """Draw the percentile table in the top right corner, below the UI panel. Returns the rectangle drawn, or None"""
+        if not self.enabled:
+            return None
+        if self.font is None:
+            self.font = pygame.font.SysFont("monospace", 14)
+        # The table only needs refreshing a few times per second, and sorting every window and rendering its text each frame would cost more than the phases it measures
+        self.frames_since_panel += 1
+        if self.panel is None or self.frames_since_panel >= 15:
+            self.frames_since_panel = 0
+            table = [f"{'phase':15s}{'p50':>8s}{'p95':>8s}{'p99':>8s}  ms"]
+            for phase in self.PHASES + ("frame",):
+                values = self.percentiles(phase)
+                if values is not None:
+                    table.append(f"{phase:15s}" + "".join(f"{v:8.2f}" for v in values))
+            table.append(f"{fps:.1f} FPS, {len(self.history)} frames recorded")
+
+            line_height = self.font.get_linesize()
+            lines = [self.font.render(text, True, (230, 230, 230)) for text in table]
+            self.panel = pygame.Surface((max(line.get_width() for line in lines) + 20, line_height * len(lines) + 20), pygame.SRCALPHA)
+            self.panel.fill((40, 40, 40, 200))   # Same translucent grey as the UI panel
+            for i, line in enumerate(lines):
+                self.panel.blit(line, (10, 10 + i * line_height))
+        return screen.blit(self.panel, (screen.get_width() - self.panel.get_width() - 10, 140))
+
+    def export(self, path=None):
+        """Write every recorded frame to a CSV file, one row per frame and one column per phase in milliseconds. Returns the path"""
+        if path is None:
+            path = time.strftime("profile_%Y%m%d_%H%M%S.csv")
+        with open(path, "w", newline="") as f:
+            writer = csv.writer(f)
+            writer.writerow(("frame",) + self.PHASES)
+            for row in self.history:
+                writer.writerow([f"{seconds * 1000:.4f}" for seconds in row])
+        return path
@@ -0,0 +1,67 @@
+import math
+import numpy as np
+import pygame
+
+class FlockRenderer:
+    """Draws the whole flock in one blit pass from cached, pre-rotated boid triangles"""
+    def __init__(self, headings=64, color_step=16):
+        self.headings = headings        # Number of quantized headings, 64 gives steps of under 6 degrees
+        self.color_step = color_step    # Boid colors are rounded to this step, so a few dozen sprite sets cover the whole flock
+        self.sprite_sets = {}           # (size, rounded r, g, b) -> one sprite per heading
+
+    def sprite_set(self, look):
+        """Sprites of a boid triangle at every heading, built the first time a size and color are drawn"""
+        sprites = self.sprite_sets.get(look)
+        if sprites is None:
+            size, color = look[0], look[1:]
+            sprites = [self.render_sprite(size, color, 2 * math.pi * i / self.headings) for i in range(self.headings)]
+            self.sprite_sets[look] = sprites
+        return sprites
+
+    @staticmethod
+    def render_sprite(size, color, angle):
+        """One boid triangle, same shape as Boid.draw, centered on a transparent square"""
+        half = int(math.ceil(size)) + 1
+        surface = pygame.Surface((2 * half + 1, 2 * half + 1))
+        surface.set_colorkey((0, 0, 0), pygame.RLEACCEL)   # Black is never a boid color, colorkeyed blits are much faster than per-pixel alpha
+        points = [
+            (half + size * math.cos(angle), half + size * math.sin(angle)),                          # Nose (front)
+            (half + size * 0.7 * math.cos(angle + 2.5), half + size * 0.7 * math.sin(angle + 2.5)),  # Left wing
+            (half + size * 0.7 * math.cos(angle - 2.5), half + size * 0.7 * math.sin(angle - 2.5)),  # Right wing
+        ]
+        pygame.draw.polygon(surface, color, points)
+        return surface
+
+    def draw(self, screen, state, previous=None, alpha=1.0):
+        """Draw every boid from a flock state array (see world.STATE_COLUMNS), returning the rectangles covered.
+        With previous positions, boids are drawn alpha of the way from there to where they are now"""
+        if len(state) == 0:
+            return []
+        # Everything is vectorized over the flock
+        angles = np.arctan2(state[:, 3], state[:, 2])   # Zero velocity gives heading 0, as in Boid.draw
+        headings = np.rint(angles * (self.headings / (2 * math.pi))).astype(np.int64) % self.headings
+
+        # Distinct (size, rounded color) looks in the flock, and which one each boid uses. Packed into one integer per boid, as unique on rows is much slower
+        rgb = np.minimum(np.rint(state[:, 5:] / self.color_step) * self.color_step, 255).astype(np.int64)
+        packed = (np.rint(state[:, 4] * 16).astype(np.int64) << 24) | (rgb[:, 0] << 16) | (rgb[:, 1] << 8) | rgb[:, 2]
+        looks, look_index = np.unique(packed, return_inverse=True)
+        look_index = look_index.reshape(-1)
+        sheet = []   # Sprites of every look back to back, so a boid's sprite is sheet[look * headings + heading]
+        halves = np.empty(len(looks), dtype=np.int64)
+        for k, look in enumerate(looks.tolist()):
+            sprites = self.sprite_set(((look >> 24) / 16, (look >> 16) & 255, (look >> 8) & 255, look & 255))
+            sheet.extend(sprites)
+            halves[k] = sprites[0].get_width() // 2
+
+        positions = state[:, :2]
+        if previous is not None and alpha < 1.0 and len(previous) == len(state):
+            previous = np.asarray(previous, dtype=float)
+            step = positions - previous
+            # A boid that wrapped around the screen edge is drawn where it is now, not dragged across the screen
+            wrapped = (np.abs(step) > np.array(screen.get_size()) / 2).any(axis=1)
+            positions = np.where(wrapped[:, None], positions, previous + step * alpha)
+
+        # Top-left corners, so each sprite's center lands on the boid
+        corners = np.rint(positions).astype(np.int64) - halves[look_index][:, None]
+        return screen.blits([(sheet[k], corner) for k, corner in
+                             zip((look_index * self.headings + headings).tolist(), corners.tolist())])
@@ -0,0 +1,237 @@
+import random
+import numpy as np
+from spatial_hash import neighbor_sums
+
+class Flock:
+    """Every boid of the simulation in flat preallocated arrays, stepped for the whole flock at once.
+
+    Follows the same rules as Boid.apply_behavior with a distance field, called for every boid before any
+    Boid.update so each one sees the flock as it was at the start of the step. Per-boid state and
+    every intermediate force live in arrays sized once per capacity, and each rule writes into them
+    in place, so a step creates no per-boid Python objects for the garbage collector to track.
+    Boids are rows 0 to count - 1, and the arrays only reallocate when the flock outgrows them."""
+    # Per-boid arrays as (trailing shape, dtype)
+    ARRAYS = {
+        "positions": ((2,), float),
+        "velocities": ((2,), float),
+        "colors": ((3,), np.uint8),
+        "perception_radii": ((), float),  # Per-boid radii and field of view, in the form neighbor_sums takes them
+        "avoidance_radii": ((), float),
+        "fields_of_view": ((), float),
+        # Buffers of the behavior pipeline
+        "acceleration": ((2,), float),    # Acceleration allocated so far this step
+        "force": ((2,), float),           # Force of the behavior being allocated
+        "remaining": ((), float),         # Acceleration still available to lower priority behaviors
+        "active": ((), bool),             # Boids with acceleration remaining
+        "valid": ((), bool),              # Boids the current behavior applies to
+        "mask": ((), bool),
+        "magnitude": ((), float),
+        "scale": ((), float),
+        "scratch": ((), float),
+    }
+
+    def __init__(self, width, height, capacity=0):
+        self.width = width
+        self.height = height
+
+        # Boid parameters, shared by every boid, same values as Boid
+        self.max_speed = 5
+        self.max_force = 0.1
+        self.perception_radius = 50
+        self.avoidance_radius = self.perception_radius / 2
+        self.field_of_view = 2 * np.pi
+        self.size = 8
+
+        self.count = 0       # Number of boids, the first rows of every array
+        self.capacity = 0    # Rows allocated
+        self.reserve(max(capacity, 1))
+
+    def __len__(self):
+        return self.count
+
+    def reserve(self, capacity):
+        """Grow every array to hold at least capacity boids, keeping the current ones. Capacity at least doubles so growing one boid at a time stays cheap"""
+        if capacity <= self.capacity:
+            return
+        capacity = max(capacity, 2 * self.capacity)
+        for name, (shape, dtype) in self.ARRAYS.items():
+            array = np.zeros((capacity,) + shape, dtype=dtype)
+            if self.capacity:
+                array[:self.count] = getattr(self, name)[:self.count]
+            setattr(self, name, array)
+        self.capacity = capacity
+
+    def add(self, positions, velocities, colors):
+        """Append boids from (k, 2) positions and velocities and (k, 3) colors"""
+        start, end = self.count, self.count + len(positions)
+        self.reserve(end)
+        self.positions[start:end] = positions
+        self.velocities[start:end] = velocities
+        self.colors[start:end] = colors
+        self.perception_radii[start:end] = self.perception_radius
+        self.avoidance_radii[start:end] = self.avoidance_radius
+        self.fields_of_view[start:end] = self.field_of_view
+        self.count = end
+
+    def truncate(self, count):
+        """Drop every boid after the first count"""
+        self.count = min(self.count, count)
+
+    def neighborhoods(self, spatial_hash):
+        """Neighbor sums of every boid, see spatial_hash.neighbor_sums"""
+        n = self.count
+        return neighbor_sums(self.positions[:n], self.velocities[:n], self.perception_radii[:n],
+                             self.avoidance_radii[:n], self.fields_of_view[:n], spatial_hash)
+
+    def apply_behavior(self, neighborhoods, cohesion_weight, alignment_weight, separation_weight, target=None, distance_field=None):
+        """Boid.apply_behavior for every boid: obstacle avoidance, separation, alignment, cohesion and target seeking, each
+        given acceleration in that order until the total runs out. The result is left in the acceleration buffer"""
+        n = self.count
+        if n == 0:
+            return
+        counts, velocity_sums, position_sums, separation_counts, separation_sums = neighborhoods
+        positions, force, valid = self.positions[:n], self.force[:n], self.valid[:n]
+        self.acceleration[:n] = 0
+        self.remaining[:n] = self.max_force * 2   # Total available acceleration, as in Boid.apply_behavior
+        self.active[:n] = True
+
+        # 1. Obstacle avoidance (highest priority)
+        if distance_field is not None:
+            self.avoid_distance_field(distance_field)
+            force *= 2   # Avoidance gain
+            self.allocate(force)
+
+        # 2. Separation, steering away from the average repulsion vector
+        np.greater(separation_counts, 0, out=valid)
+        force[:] = separation_sums
+        np.divide(force, separation_counts[:, None], out=force, where=valid[:, None])
+        self.steer(force, valid)
+        force *= separation_weight
+        self.allocate(force)
+
+        # 3. Alignment, steering towards the average velocity of the neighbors
+        np.greater(counts, 0, out=valid)
+        force[:] = velocity_sums
+        np.divide(force, counts[:, None], out=force, where=valid[:, None])
+        self.steer(force, valid)
+        force *= alignment_weight
+        self.allocate(force)
+
+        # 4. Cohesion, seeking the center of mass of the neighbors
+        np.greater(counts, 0, out=valid)
+        force[:] = position_sums
+        np.divide(force, counts[:, None], out=force, where=valid[:, None])
+        force -= positions
+        self.steer(force, valid, 0.1)
+        force *= cohesion_weight
+        self.allocate(force)
+
+        # 5. Target seeking (lowest priority)
+        if target:
+            valid.fill(True)
+            force[:] = target
+            force -= positions
+            self.steer(force, valid, 0.1)
+            self.allocate(force)
+
+    def update(self):
+        """Boid.update for every boid: apply the acceleration, limit speed, move and wrap around the screen edges"""
+        n = self.count
+        positions, velocities = self.positions[:n], self.velocities[:n]
+        velocities += self.acceleration[:n]
+        self.limit(velocities, self.max_speed)
+        positions += velocities
+        np.mod(positions[:, 0], self.width, out=positions[:, 0])
+        np.mod(positions[:, 1], self.height, out=positions[:, 1])
+
+    def lengths(self, vectors):
+        """Length of every row of an (n, 2) array, written to the magnitude buffer"""
+        n = len(vectors)
+        magnitude, scratch = self.magnitude[:n], self.scratch[:n]
+        np.multiply(vectors[:, 0], vectors[:, 0], out=magnitude)
+        np.multiply(vectors[:, 1], vectors[:, 1], out=scratch)
+        magnitude += scratch
+        return np.sqrt(magnitude, out=magnitude)
+
+    def limit(self, vectors, limits):
+        """Scale rows longer than limits (one value or one per row) down to it in place, as Vector2.scale_to_length. Returns the new lengths"""
+        n = len(vectors)
+        magnitude, scale, longer = self.lengths(vectors), self.scale[:n], self.mask[:n]
+        scale.fill(1.0)
+        np.greater(magnitude, limits, out=longer)
+        np.divide(limits, magnitude, out=scale, where=longer)
+        vectors *= scale[:, None]
+        np.minimum(magnitude, limits, out=magnitude)
+        return magnitude
+
+    def steer(self, force, valid, closest=0.0):
+        """Turn desired directions into steering forces in place: scaled to max speed, minus the current velocity, limited to max force.
+        Rows not valid, zero length, or shorter than closest (seek's dead zone) become zero"""
+        n = len(force)
+        magnitude, usable = self.lengths(force), self.mask[:n]
+        if closest > 0:
+            np.greater_equal(magnitude, closest, out=usable)
+        else:
+            np.greater(magnitude, 0, out=usable)
+        valid &= usable
+        np.divide(force, magnitude[:, None], out=force, where=valid[:, None])
+        force *= self.max_speed
+        force -= self.velocities[:n]
+        self.limit(force, self.max_force)
+        force *= valid[:, None]
+
+    def allocate(self, force):
+        """Add a behavior's force to the acceleration of boids with some remaining, scaled down to what remains"""
+        n = len(force)
+        remaining, active, positive = self.remaining[:n], self.active[:n], self.mask[:n]
+        magnitude = self.limit(force, remaining)
+        force *= active[:, None]
+        magnitude *= active
+        self.acceleration[:n] += force
+        remaining -= magnitude
+        np.greater(remaining, 0, out=positive)
+        active &= positive
+
+    def avoid_distance_field(self, field):
+        """Boid.avoid_distance_field for every boid, written to the force buffer"""
+        n = self.count
+        force = self.force[:n]
+        force.fill(0)
+        positions, velocities = self.positions[:n], self.velocities[:n]
+        distance, gx, gy = field.sample_many(positions[:, 0], positions[:, 1])
+
+        # Only boids near an obstacle, usually a small part of the flock, are looked at further
+        near = np.flatnonzero((distance < self.perception_radius) | (distance < self.size + self.max_speed * 1.5))
+        if len(near) == 0:
+            return
+        distance = distance[near]
+        away = np.stack([gx[near], gy[near]], axis=1)   # Points away from the nearest surface
+        length = np.sqrt(away[:, 0] * away[:, 0] + away[:, 1] * away[:, 1])
+        for k in np.flatnonzero(length == 0):
+            # The gradient vanishes where two surfaces are equally close, pick a random direction as Boid does
+            away[k] = random.uniform(-1, 1), random.uniform(-1, 1)
+            length[k] = np.sqrt(away[k, 0] * away[k, 0] + away[k, 1] * away[k, 1])
+        moving = length > 0
+        away[moving] /= length[moving, None]
+        result = np.zeros_like(away)
+
+        # If close to collision, strong repulsion
+        collide = moving & (distance < self.size)
+        result[collide] = away[collide] * self.max_force * 5.0
+
+        # Steer along the surface if the predicted position would be inside an obstacle
+        ahead = np.flatnonzero(moving & ~collide)
+        future = positions[near[ahead]] + velocities[near[ahead]] * 1.5
+        future_distance = field.sample_many(future[:, 0], future[:, 1])[0]
+        swerve = ahead[future_distance < self.size]
+        perpendicular = np.stack([away[swerve, 1], -away[swerve, 0]], axis=1)
+        velocity = velocities[near[swerve]]
+        perpendicular[perpendicular[:, 0] * velocity[:, 0] + perpendicular[:, 1] * velocity[:, 1] < 0] *= -1
+        strength = self.perception_radius / np.maximum(distance[swerve], 0.1)
+        result[swerve] = perpendicular * np.minimum(strength * self.max_force * 3, self.max_force * 5)[:, None]
+
+        # Mild repulsion in perceptive range, fading to zero at the perception radius
+        mild = ahead[(future_distance >= self.size) & (distance[ahead] < self.perception_radius)]
+        result[mild] = away[mild] * (self.max_force * 6 * (1.0 - distance[mild] / self.perception_radius))[:, None]
+
+        force[near] = result
@@ -1,14 +1,27 @@
 import pygame
 import numpy as np
 from pygame import Vector2
-import random
-from boid import Boid
-from obstacles import ObstacleManager, CircleObstacle, RectObstacle
+import time
+from obstacles import CircleObstacle, RectObstacle
 from ui import UIManager
+from profiler import FrameProfiler
+from renderer import FlockRenderer
+from world import FlockWorld
+from worker import SimulationWorker
 
 class FlockSimulation:
     """Main simulation class that manages boids and the environment"""
-    def __init__(self, width, height, num_boids=100):
+    # Past this many rectangles drawn in a frame, restoring and pushing the whole screen is cheaper than doing it piece by piece
+    MAX_DIRTY_RECTS = 400
+    
+    # Fixed timestep: one update() is one physics step of 1/60 simulated seconds, since boid speeds and forces are per step
+    STEP_HZ = 60
+    RENDER_FPS = 60
+    MAX_STEPS_PER_FRAME = 64      # When the machine can't keep up, the simulation slows down instead of falling further and further behind
+    MAX_TIME_SCALE = 32           # Fastest speed multiplier, in real-time mode
+    TURBO_RENDER_EVERY = 10       # In turbo mode, physics steps between rendered frames
+    
+    def __init__(self, width, height, num_boids=100, use_worker=False):
         # Initialize pygame
         pygame.init()
         self.screen = pygame.display.set_mode((width, height))
@@ -22,16 +35,21 @@ class FlockSimulation:
         self.clock = pygame.time.Clock()
         self.running = True                  # Flag to check if simulationm is running
         
-        # Initialize boids
-        self.boids = []
-        self.create_boids(num_boids)      # Create initial boid population
+        # Per-phase frame timers, toggled with F3 and exported with F4. Costs one flag check per phase while off
+        self.profiler = FrameProfiler()
         
-        # Initialize obstacles
-        self.obstacle_manager = ObstacleManager()   # Create an instance of the ObstacleManager class to manage obstacles
+        # Boids, obstacles and physics. With a worker, the flock lives in the worker process and this copy only holds the obstacles and target to draw
+        self.world = FlockWorld(width, height, 0 if use_worker else num_boids, self.profiler)
+        self.obstacle_manager = self.world.obstacle_manager
         
         # UI Manager
         self.ui_manager = UIManager(width, height)  # Create an instance of the UIManager class to manage UI elements
         
+        # Background simulation process, the window then only draws the snapshots it publishes
+        self.worker = SimulationWorker(width, height, num_boids, max(num_boids, int(self.ui_manager.boids_slider.max_val))) if use_worker else None
+        self.sent_settings = None     # Last settings sent to the worker, so unchanged settings are not sent again
+        self.state = self.world.state()   # Flock state drawn in the last frame
+        
         # Target for boids to follow (controlled by mouse)
         self.target = None            # Target position for boids to follow
         self.use_target = False       # Flag to check if target is being used
@@ -39,40 +57,130 @@ class FlockSimulation:
         # Obstacle creation properties
         self.obstacle_radius = 30     # Default radius for obstacle creation, can be adjusted with mouse wheel
         
-    def create_boids(self, num_boids):
-        """Create initial boid population"""
-        self.boids = []   # Initialize boids list to empty, used for resetting the simulation
-        for _ in range(num_boids):
-            # Place boids randomly in the middle third of the screen. I didn't guarantee that they wouldn't overlap but the collision logic should put them away if they do and probability is low
-            x = random.uniform(self.width / 3, 2 * self.width / 3)
-            y = random.uniform(self.height / 3, 2 * self.height / 3)
-            
-            # Create and add boid
-            boid = Boid(x, y, self.width, self.height)
-            # Randomize colors of boids slightly for visual interest
-            r = random.randint(200, 255)
-            g = random.randint(200, 255)
-            b = random.randint(200, 255)
-            boid.color = (r, g, b)
-            self.boids.append(boid)
+        # Draws the flock in one pass from cached boid sprites
+        self.renderer = FlockRenderer()
+        
+        # Dirty-rect rendering: only what the last frame drew is restored from the obstacle layer and sent to the display
+        self.dirty_rects = []         # Rectangles drawn in the previous frame
+        self.shown_layer = None       # Version of the obstacle layer on screen, None forces a full redraw
+        
+        # Simulation speed: time_scale simulated seconds per real second, or as fast as possible in turbo mode
+        self.time_scale = 1.0
+        self.turbo = False
+        self.previous_positions = None   # Boid positions before the last physics step, for interpolated drawing
+        
+    def reset_boids(self):
+        """Replace every boid with a new random one"""
+        if self.worker:
+            self.worker.send("reset")
+        else:
+            self.world.create_boids(len(self.world.flock))
+            self.previous_positions = None   # Nothing to interpolate from for new boids
     
     def run(self):
-        """Main simulation loop"""
+        """Main simulation loop: fixed-timestep physics, decoupled from the render rate"""
+        if self.worker:
+            self.run_viewer()
+            return
+        step_time = 1.0 / self.STEP_HZ
+        accumulator = 0.0          # Real time owed to the simulation, scaled by the speed multiplier
+        last_time = time.perf_counter()
         while self.running:
+            self.profiler.begin_frame()
+            
             # Handle events
+            self.profiler.start("events")
             self.handle_events()
+            self.profiler.stop("events")
+            
+            now = time.perf_counter()
+            elapsed, last_time = now - last_time, now
+            if self.turbo:
+                # Turbo: a fixed batch of steps per rendered frame, as fast as the machine allows
+                steps = self.TURBO_RENDER_EVERY
+                accumulator = 0.0
+            else:
+                # Run as many whole steps as the elapsed time covers, carrying the remainder over to the next frame
+                accumulator += elapsed * self.time_scale
+                steps = min(int(accumulator / step_time), self.MAX_STEPS_PER_FRAME)
+                accumulator -= steps * step_time
+                accumulator = min(accumulator, step_time)   # Drop any backlog beyond one step, see MAX_STEPS_PER_FRAME
             
             # Update simulation
-            self.update()
+            for _ in range(steps):
+                self.previous_positions = self.world.positions()
+                self.update()
             
-            # Render
-            self.render()
+            # Render, drawing boids part way from their previous to their current position by the fraction of a step not yet simulated. Turbo frames show the latest step
+            self.state = self.world.state()
+            self.render(1.0 if self.turbo else accumulator / step_time)
+            self.profiler.end_frame()
             
-            # Cap frame rate, so each update occurs at 1/60 seconds
-            self.clock.tick(60)
+            # Cap frame rate, the simulation catches up through the accumulator. Turbo mode renders as fast as it can
+            self.clock.tick(0 if self.turbo else self.RENDER_FPS)
         
         pygame.quit()
     
+    def run_viewer(self):
+        """Loop of the window when a worker runs the simulation: handle input, pass settings on, draw the latest snapshot.
+        If the worker dies, the simulation carries on in this process from the last snapshot"""
+        worker_died = False
+        try:
+            while self.running:
+                self.profiler.begin_frame()
+                
+                self.profiler.start("events")
+                self.handle_events()
+                # A dead worker (say from an exception in FlockWorld.apply) publishes nothing more, and its last snapshot would stay on screen forever
+                if not self.worker.process.is_alive():
+                    worker_died = True
+                    break
+                self.send_settings()
+                self.profiler.stop("events")
+                
+                # Snapshots arrive once per physics step, so there is nothing to interpolate between
+                self.state, _ = self.worker.latest()
+                self.render()
+                self.profiler.end_frame()
+                
+                self.clock.tick(self.RENDER_FPS)
+        finally:
+            exitcode = self.worker.process.exitcode
+            self.worker.close()
+            if not worker_died:
+                pygame.quit()
+        if not worker_died:
+            return
+        
+        # Fall back to in-process mode, starting from the flock as last drawn
+        print(f"Simulation worker exited with code {exitcode}, continuing in this process")
+        self.worker = None
+        self.world.flock.truncate(0)
+        self.world.flock.add(self.state[:, 0:2], self.state[:, 2:4], self.state[:, 5:])
+        self.set_speed()   # Caption now shows the in-process speed
+        self.run()
+    
+    def send_settings(self):
+        """Send the UI settings and target to the worker when they changed"""
+        settings = (self.ui_manager.get_behavior_weights(), self.ui_manager.get_num_boids(),
+                    None if self.target is None else (self.target.x, self.target.y))
+        if settings != self.sent_settings:
+            self.worker.send("settings", *settings)
+            self.sent_settings = settings
+    
+    def set_speed(self, time_scale=None, turbo=None):
+        """Change the speed multiplier or turbo mode, and show the speed in the window title"""
+        if time_scale is not None:
+            self.time_scale = min(max(time_scale, 1 / 8), self.MAX_TIME_SCALE)
+        if turbo is not None:
+            self.turbo = turbo
+        if self.worker:
+            self.worker.send("speed", self.time_scale, self.turbo)
+            speed = "turbo" if self.turbo else f"{self.time_scale:g}x"
+        else:
+            speed = f"turbo, rendering every {self.TURBO_RENDER_EVERY} steps" if self.turbo else f"{self.time_scale:g}x"
+        pygame.display.set_caption(f"Boid Flocking Simulation ({speed})")
+    
     def handle_events(self):
         """Process user inputs"""
         for event in pygame.event.get():
@@ -86,9 +194,11 @@ class FlockSimulation:
                 ui_action = self.ui_manager.handle_event(event)  
                 if ui_action:
                     if ui_action == "reset_boids":           # Clear all existing boids and create new ones
-                        self.create_boids(len(self.boids))
+                        self.reset_boids()
                     elif ui_action == "clear_obstacles":     # Clear all existing obstacles
                         self.obstacle_manager.remove_all()
+                        if self.worker:
+                            self.worker.send("remove_all")
                     continue                                   
                 
                 # Left mouse button: Add obstacle
@@ -108,6 +218,8 @@ class FlockSimulation:
                             obstacle = CircleObstacle(pos[0], pos[1], self.obstacle_radius)
                     
                         self.obstacle_manager.add_obstacle(obstacle)
+                        if self.worker:
+                            self.worker.send("add_obstacle", obstacle)
                 # Check if the obstacle collides with any boids                
                 # Right mouse button: Set/unset target
                 elif event.button == 3:
@@ -123,6 +235,24 @@ class FlockSimulation:
                 pos = pygame.mouse.get_pos()
                 self.target = Vector2(pos)
             
+            # F3: Toggle profiler overlay, F4: Export recorded frame timings
+            elif event.type == pygame.KEYDOWN and event.key == pygame.K_F3:
+                self.profiler.toggle()
+            elif event.type == pygame.KEYDOWN and event.key == pygame.K_F4:
+                print(f"Frame timings written to {self.profiler.export()}")
+            
+            # +/-: Double or halve the simulation speed, T: Toggle turbo mode
+            elif event.type == pygame.KEYDOWN and event.key in (pygame.K_EQUALS, pygame.K_PLUS, pygame.K_KP_PLUS):
+                self.set_speed(time_scale=self.time_scale * 2)
+            elif event.type == pygame.KEYDOWN and event.key in (pygame.K_MINUS, pygame.K_KP_MINUS):
+                self.set_speed(time_scale=self.time_scale / 2)
+            elif event.type == pygame.KEYDOWN and event.key == pygame.K_t:
+                self.set_speed(turbo=not self.turbo)
+            
+            # Window was uncovered or restored, so the display needs every pixel again
+            elif event.type == pygame.VIDEOEXPOSE:
+                self.shown_layer = None
+            
             # Mouse wheel: Adjust obstacle radius between 10 and 100 pixels
             elif event.type == pygame.MOUSEWHEEL:
                 self.obstacle_radius = max(10, min(100, self.obstacle_radius + event.y * 5))
@@ -132,84 +262,61 @@ class FlockSimulation:
                 self.ui_manager.handle_event(event)
     
     def update(self):
-        """Update simulation state and behavior of boids"""
-        # Get behavior weights from UI
-        weights = self.ui_manager.get_behavior_weights()
-        
-        # Check if number of boids needs to be adjusted
-        current_boids = len(self.boids)
-        target_boids = self.ui_manager.get_num_boids()
-        
-        if current_boids < target_boids:
-            # Add more boids
-            for _ in range(target_boids - current_boids):
-                x = random.uniform(self.width / 3, 2 * self.width / 3)
-                y = random.uniform(self.height / 3, 2 * self.height / 3)
-                boid = Boid(x, y, self.width, self.height)
-                # Randomize colors slightly for visual interest
-                r = random.randint(200, 255)
-                g = random.randint(200, 255)
-                b = random.randint(200, 255)
-                boid.color = (r, g, b)
-                self.boids.append(boid)
-        elif current_boids > target_boids:
-            # Remove excess boids
-            self.boids = self.boids[:target_boids]
-        
-        # Update each boid
-        for boid in self.boids:
-            # Get nearby obstacles for this boid
-            obstacles_near = self.obstacle_manager.get_obstacles_near(
-                boid.position, boid.perception_radius * 2
-            )
-            
-            # Apply flocking behaviors with current weights and obstacle avoidance
-            boid.apply_behavior(
-                self.boids,
-                weights["cohesion"],
-                weights["alignment"],
-                weights["separation"],
-                self.target,
-                obstacles_near
-            )
-            
-            # Update boid position
-            boid.update()
+        """Update simulation state and behavior of boids by one physics step, with the current UI settings"""
+        self.world.weights = self.ui_manager.get_behavior_weights()   # Get behavior weights from UI
+        self.world.num_boids = self.ui_manager.get_num_boids()        # Number of boids may need to be adjusted
+        self.world.target = self.target
+        self.world.step()
     
-    def render(self):
-        """Render the current simulation state"""
-        # Clear screen
-        self.screen.fill((10, 10, 20))  # Dark blue-ish background
+    def render(self, alpha=1.0):
+        """Render the current simulation state, with boids interpolated alpha of the way from their previous positions"""
+        # Clear screen by restoring the cached obstacle layer: all of it after obstacles changed or when too much moved, otherwise only where the last frame drew
+        self.profiler.start("background")
+        layer = self.obstacle_manager.get_layer(self.screen.get_size(), (10, 10, 20))  # Dark blue-ish background
+        full_redraw = self.shown_layer != self.obstacle_manager.layer_version or len(self.dirty_rects) > self.MAX_DIRTY_RECTS
+        if full_redraw:
+            self.screen.blit(layer, (0, 0))
+            self.shown_layer = self.obstacle_manager.layer_version
+        else:
+            for rect in self.dirty_rects:
+                self.screen.blit(layer, rect, rect)
+        self.profiler.stop("background")
         
-        # Enable draw obstacles
-        self.obstacle_manager.draw_all(self.screen)
+        drawn = []  # Rectangles drawn this frame, erased again at the start of the next one
         
         # Draw target indicator as two green circles when target mode is active (with right click)
+        self.profiler.start("draw_target")
         if self.use_target and self.target:
-            pygame.draw.circle(
+            drawn.append(pygame.draw.circle(
                 self.screen,
                 (0, 255, 0),  # Green
                 (int(self.target.x), int(self.target.y)),
                 8,
                 2  # Line width
-            )
+            ))
             # Draw rings around target for visual interest
-            pygame.draw.circle(
+            drawn.append(pygame.draw.circle(
                 self.screen,
                 (0, 200, 0, 128),  # Semi-transparent green
                 (int(self.target.x), int(self.target.y)),
                 15,
                 1
-            )
+            ))
+        
+        self.profiler.stop("draw_target")
         
         # Draw all boids
-        for boid in self.boids:
-            boid.draw(self.screen)
+        self.profiler.start("draw_boids")
+        drawn.extend(self.renderer.draw(self.screen, self.state, self.previous_positions, alpha))
+        self.profiler.stop("draw_boids")
         
         # Draw UI elements
-        self.ui_manager.draw(self.screen)
+        self.profiler.start("draw_ui")
+        drawn.append(self.ui_manager.draw(self.screen))
+        self.profiler.stop("draw_ui")
         
         # Draw current obstacle creation size indicator if mouse button is not pressed
+        self.profiler.start("draw_preview")
         if not pygame.mouse.get_pressed()[0]:
             pos = pygame.mouse.get_pos()
             keys = pygame.key.get_pressed()
@@ -222,21 +329,33 @@ class FlockSimulation:
                     self.obstacle_radius * 2, 
                     self.obstacle_radius * 2
                 )
-                pygame.draw.rect(
+                drawn.append(pygame.draw.rect(
                     self.screen,
                     (200, 0, 0, 128),  # Semi-transparent red
                     rect,
                     1  # Line width
-                )
+                ))
             else:
                 # Circular obstacle preview
-                pygame.draw.circle(
+                drawn.append(pygame.draw.circle(
                     self.screen,
                     (200, 0, 0, 128),  # Semi-transparent red
                     pos,
                     self.obstacle_radius,
                     1  # Line width
-                )
+                ))
+        self.profiler.stop("draw_preview")
+        
+        # Profiler overlay on top of everything else, when enabled
+        overlay = self.profiler.draw(self.screen, self.clock.get_fps())
+        if overlay:
+            drawn.append(overlay)
         
-        # Update display to show newly rendered frame
-        pygame.display.flip()
\ No newline at end of file
+        # Update display to show newly rendered frame, only the parts that changed since the last one unless the whole screen was redrawn
+        self.profiler.start("display")
+        if full_redraw:
+            pygame.display.flip()
+        else:
+            pygame.display.update(self.dirty_rects + drawn)
+        self.dirty_rects = drawn
+        self.profiler.stop("display")
\ No newline at end of file
@@ -0,0 +1,100 @@
+import numpy as np
+
+class SpatialHash:
+    """Uniform grid over boid positions, used to find every boid's neighbors in one pass per frame"""
+    # Offsets of the 3x3 block of cells around a cell. With cells as wide as the perception radius, any boid that can be perceived is in this block
+    NEIGHBOR_CELLS = [(ox, oy) for oy in (-1, 0, 1) for ox in (-1, 0, 1)]
+
+    def __init__(self, cell_size=50):
+        self.cell_size = float(cell_size)
+        self.positions = np.zeros((0, 2))
+        self.keys = np.zeros(0, dtype=np.int64)         # Cell key of each boid
+        self.order = np.zeros(0, dtype=np.int64)        # Boid indices sorted by cell key
+        self.sorted_keys = np.zeros(0, dtype=np.int64)  # Cell keys in that sorted order
+        self.cell_start = np.zeros(1, dtype=np.int64)   # Per cell key, where its run starts in the sorted order
+        self.cell_count = np.zeros(1, dtype=np.int64)   # Per cell key, the number of boids in it
+        self.stride = 1                                 # Number of cells per grid row
+
+    def rebuild(self, positions):
+        """Bin all boid positions into grid cells, done once per frame"""
+        self.positions = np.asarray(positions, dtype=float).reshape(-1, 2)
+        if len(self.positions) == 0:
+            self.keys = self.order = self.sorted_keys = np.zeros(0, dtype=np.int64)
+            self.cell_start = self.cell_count = np.zeros(1, dtype=np.int64)
+            return
+        cells = np.floor(self.positions / self.cell_size).astype(np.int64)
+        # Shift so occupied cells start at (1, 1). The empty border keeps neighbor lookups from wrapping into the next grid row
+        cells -= cells.min(axis=0) - 1
+        self.stride = int(cells[:, 0].max()) + 2
+        self.keys = cells[:, 1] * self.stride + cells[:, 0]
+        self.order = np.argsort(self.keys, kind="stable")
+        self.sorted_keys = self.keys[self.order]
+        # Dense per-cell tables, one row past the last occupied one so every neighbor lookup stays in range
+        self.cell_count = np.bincount(self.keys, minlength=int(self.sorted_keys[-1]) + self.stride + 2)
+        self.cell_start = np.cumsum(self.cell_count) - self.cell_count
+
+    def candidate_pairs(self):
+        """All ordered pairs of different boids (i, j) whose cells touch"""
+        n = len(self.keys)
+        if n == 0:
+            empty = np.zeros(0, dtype=np.int64)
+            return empty, empty
+        offsets = np.array([oy * self.stride + ox for ox, oy in self.NEIGHBOR_CELLS], dtype=np.int64)
+        query_keys = (self.keys[None, :] + offsets[:, None]).ravel()
+        start = self.cell_start[query_keys]    # Each neighbor cell is one contiguous run of the sorted boids
+        counts = self.cell_count[query_keys]
+
+        i = np.repeat(np.tile(np.arange(n), len(offsets)), counts)
+        run_starts = np.repeat(start - (np.cumsum(counts) - counts), counts)  # Expand each run into its boid indices
+        j = self.order[np.arange(counts.sum()) + run_starts]
+        keep = i != j
+        return i[keep], j[keep]
+
+    def pairs(self, radius):
+        """Ordered pairs within radius as (i, j, dx, dy, dist), where (dx, dy) points from boid i to boid j"""
+        if radius > self.cell_size:
+            raise ValueError(f"query radius {radius} is larger than the cell size {self.cell_size}")
+        i, j = self.candidate_pairs()
+        x, y = np.ascontiguousarray(self.positions.T)   # Gathers from contiguous columns are much faster than strided ones
+        dx = x[j] - x[i]
+        dy = y[j] - y[i]
+        dist = np.sqrt(dx * dx + dy * dy)
+        near = np.flatnonzero(dist <= radius)   # Same test as Boid.can_perceive, which only rejects distance > perception_radius
+        return i[near], j[near], dx[near], dy[near], dist[near]
+
+def neighbor_sums(positions, velocities, perception, avoidance, field_of_view, spatial_hash):
+    """Sums over the boids each boid can perceive, shared by align, cohere and separate, for the whole flock as arrays: counts,
+    velocity sums, position sums, separation counts and separation sums (unit vectors away from boids inside the avoidance radius,
+    each divided by its distance). Every sum describes the flock as it is when this is called, so updating from them is synchronous.
+    Takes (N, 2) positions and velocities and per-boid (N,) perception radius, avoidance radius and field of view"""
+    n = len(positions)
+
+    # Cells sized to the largest perception radius in the flock
+    spatial_hash.cell_size = float(perception.max())
+    spatial_hash.rebuild(positions)
+    i, j, dx, dy, dist = spatial_hash.pairs(spatial_hash.cell_size)
+
+    # Same rules as Boid.can_perceive: within the boid's own radius, and inside its field of view unless it has full vision, is not moving, or sits on top of the other boid.
+    # A flock where every boid sees all around at the largest radius, the usual case, has nothing left to filter
+    if perception.min() < spatial_hash.cell_size or field_of_view.min() < 2 * np.pi:
+        speed = np.sqrt((velocities ** 2).sum(axis=1))
+        full_view = (field_of_view[i] >= 2 * np.pi) | (speed[i] == 0) | (dist == 0)
+        with np.errstate(invalid="ignore", divide="ignore"):
+            forward_dot = (dx * velocities[i, 0] + dy * velocities[i, 1]) / speed[i]
+        in_view = full_view | (forward_dot >= np.cos(np.minimum(field_of_view[i], 2 * np.pi) / 2) * dist)
+        visible = np.flatnonzero((dist <= perception[i]) & in_view)
+        i, j, dx, dy, dist = i[visible], j[visible], dx[visible], dy[visible], dist[visible]
+
+    counts = np.bincount(i, minlength=n)
+    velocity_sums = np.stack([np.bincount(i, weights=column[j], minlength=n) for column in np.ascontiguousarray(velocities.T)], axis=1)
+    position_sums = np.stack([np.bincount(i, weights=column[j], minlength=n) for column in np.ascontiguousarray(positions.T)], axis=1)
+
+    # Separation only counts perceived boids inside the avoidance radius that are not exactly on top of this boid
+    close = (dist < avoidance[i]) & (dist > 0)
+    ci, cdist = i[close], dist[close]
+    push = 1.0 / (cdist * np.maximum(cdist, 0.1))  # normalize(self - other) / max(distance, 0.1)
+    separation_counts = np.bincount(ci, minlength=n)
+    separation_sums = np.stack([np.bincount(ci, weights=-dx[close] * push, minlength=n),
+                                np.bincount(ci, weights=-dy[close] * push, minlength=n)], axis=1)
+
+    return counts, velocity_sums, position_sums, separation_counts, separation_sums
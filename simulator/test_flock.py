@@ -0,0 +1,70 @@
+import random
+import numpy as np
+from pygame import Vector2
+from boid import Boid
+from sim_flock import Flock
+from obstacles import ObstacleManager, CircleObstacle, RectObstacle
+from spatial_hash import SpatialHash
+
+# Flock, the array engine FlockWorld steps, against the per-boid Boid rules it was written from:
+# python -m pytest test_flock.py (or python test_flock.py). Every Boid applies its behavior before any moves,
+# so both sides see the flock as it was at the start of the step.
+
+WIDTH, HEIGHT = 1280, 720
+TOLERANCE = 1e-9
+STEPS = 60
+# (cohesion, alignment, separation) weights, target
+SETTINGS = [((0.5, 0.5, 0.5), None), ((1.0, 0.2, 1.5), (640, 360)), ((0.1, 1.0, 0.3), (100, 600))]
+
+
+def make_obstacles():
+    manager = ObstacleManager(WIDTH, HEIGHT)
+    for obstacle in (CircleObstacle(400, 300, 40), CircleObstacle(700, 420, 25), RectObstacle(900, 250, 120, 60),
+                     RectObstacle(300, 550, 60, 160)):
+        manager.add_obstacle(obstacle)
+    return manager
+
+
+def make_boids(count, seed):
+    # Spread over the whole screen, so some boids start near or inside obstacles
+    rng = np.random.default_rng(seed)
+    positions = rng.uniform((0, 0), (WIDTH, HEIGHT), (count, 2))
+    angles = rng.uniform(0, 2 * np.pi, count)
+    velocities = np.stack([np.cos(angles), np.sin(angles)], axis=1) * rng.uniform(2, 4, (count, 1))
+    flock = Flock(WIDTH, HEIGHT, count)
+    flock.add(positions, velocities, np.full((count, 3), 255))
+    boids = []
+    for (x, y), (vx, vy) in zip(positions.tolist(), velocities.tolist()):
+        boid = Boid(x, y, WIDTH, HEIGHT)
+        boid.velocity = Vector2(vx, vy)
+        boids.append(boid)
+    return flock, boids
+
+
+def test_flock_matches_boids():
+    field = make_obstacles().distance_field
+    for (cohesion, alignment, separation), target in SETTINGS:
+        flock, boids = make_boids(300, 7)
+        target = None if target is None else Vector2(target)
+        for step in range(STEPS):
+            # Both sides draw from random the same way, for gradients that vanish between two surfaces
+            random.seed(step)
+            for boid in boids:
+                boid.apply_behavior(boids, cohesion, alignment, separation, target, distance_field=field)
+            for boid in boids:
+                boid.update()
+
+            random.seed(step)
+            flock.apply_behavior(flock.neighborhoods(SpatialHash()), cohesion, alignment, separation, target, field)
+            flock.update()
+
+        positions = np.array([(b.position.x, b.position.y) for b in boids])
+        velocities = np.array([(b.velocity.x, b.velocity.y) for b in boids])
+        deviation = max(np.abs(flock.positions[:len(flock)] - positions).max(),
+                        np.abs(flock.velocities[:len(flock)] - velocities).max())
+        assert deviation <= TOLERANCE, f"weights {cohesion, alignment, separation}, target {target}: max |dx| = {deviation:.3g}"
+
+
+if __name__ == "__main__":
+    test_flock_matches_boids()
+    print("Flock matches Boid")
@@ -0,0 +1,30 @@
+import numpy as np
+from spatial_hash import SpatialHash
+
+# SpatialHash pairs against a brute-force scan:
+# python -m pytest test_spatial_hash.py (or python test_spatial_hash.py)
+
+RADIUS = 50
+
+
+def brute_force_pairs(positions, radius):
+    d = positions[None, :, :] - positions[:, None, :]
+    dist = np.sqrt((d ** 2).sum(axis=2))
+    i, j = np.nonzero(dist <= radius)
+    keep = i != j
+    return set(zip(i[keep].tolist(), j[keep].tolist()))
+
+
+def test_pairs_match_brute_force():
+    rng = np.random.default_rng(0)
+    # Spread over the screen, and a tight cluster where every cell holds dozens of boids
+    for positions in (rng.uniform((0, 0), (1280, 720), (500, 2)), rng.normal(400, 30, (1500, 2))):
+        spatial_hash = SpatialHash(RADIUS)
+        spatial_hash.rebuild(positions)
+        i, j = spatial_hash.pairs(RADIUS)[:2]
+        assert set(zip(i.tolist(), j.tolist())) == brute_force_pairs(positions, RADIUS)
+
+
+if __name__ == "__main__":
+    test_pairs_match_brute_force()
+    print("spatial hash matches brute force")
@@ -171,7 +171,7 @@ class UIManager:
         return None
     
     def draw(self, screen):
-        """Draw all UI elements"""
+        """Draw all UI elements, returning the panel rectangle they are drawn in"""
         # Draw panel background to contain all UI elements
         panel_surface = pygame.Surface((self.panel_rect.width, self.panel_rect.height), pygame.SRCALPHA)  # Transparent so we can see the background
         panel_surface.fill(self.panel_color)
@@ -191,6 +191,8 @@ class UIManager:
         for i, text in enumerate(instructions):
             text_surface = self.font.render(text, True, (230, 230, 230))   # Render text as light gray and space it out
             screen.blit(text_surface, (30, 45 + i * 20))
+        
+        return self.panel_rect
     
     def get_behavior_weights(self):
         """Get the current values of the behavior sliders, used in updating simulation during each update cycle"""
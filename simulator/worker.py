@@ -0,0 +1,99 @@
+import multiprocessing
+import queue
+import time
+from multiprocessing import shared_memory
+import numpy as np
+from world import FlockWorld, STATE_COLUMNS
+
+class SimulationWorker:
+    """Runs a FlockWorld in a background process, so physics uses its own core and never waits on the UI.
+
+    The worker publishes flock snapshots through a double buffer in shared memory: it fills the
+    slot the viewer is not reading, then flips the published index under a lock. The viewer
+    copies the published slot under the same lock, so neither ever sees a half-written flock.
+    Settings, obstacles and speed changes travel the other way through a command queue."""
+    def __init__(self, width, height, num_boids, capacity, step_hz=60):
+        self.capacity = capacity   # Most boids a snapshot can hold, the top of the boid slider
+        # Two slots of (1 + capacity) rows: row 0 holds the boid count and the step number, the rest is the flock state
+        shape = (2, capacity + 1, len(STATE_COLUMNS))
+        self.shm = shared_memory.SharedMemory(create=True, size=int(np.prod(shape)) * 8)
+        self.slots = np.frombuffer(self.shm.buf, dtype=float).reshape(shape)
+        self.slots[:] = 0
+
+        # Spawned rather than forked, so the worker starts clean instead of inheriting the viewer's SDL state
+        context = multiprocessing.get_context("spawn")
+        self.published = context.Value("i", 0)   # Slot holding the latest complete snapshot, its lock guards the flip
+        self.commands = context.Queue()
+        self.process = context.Process(target=run_worker, daemon=True,
+                                       args=(self.shm.name, shape, self.published, self.commands, width, height, num_boids, step_hz))
+        self.process.start()
+
+    def send(self, *command):
+        """Queue a command for the worker, see FlockWorld.apply, plus ("speed", time_scale, turbo)"""
+        self.commands.put(command)
+
+    def latest(self):
+        """Copy of the latest snapshot as (state, step), state being (N, len(STATE_COLUMNS))"""
+        with self.published.get_lock():
+            slot = self.slots[self.published.value]
+            count, step = int(slot[0, 0]), int(slot[0, 1])
+            state = slot[1:count + 1].copy()
+        return state, step
+
+    def close(self):
+        """Stop the worker and free the shared memory"""
+        self.send("stop")
+        self.process.join(timeout=2)
+        if self.process.is_alive():
+            self.process.terminate()
+        self.slots = None   # Drop the view so the mapping can close
+        self.shm.close()
+        self.shm.unlink()
+
+def run_worker(name, shape, published, commands, width, height, num_boids, step_hz, max_lag=0.25):
+    """Worker process body: step the world on a fixed timestep and publish every step, or in turbo mode as fast as possible"""
+    shm = shared_memory.SharedMemory(name=name)
+    slots = np.frombuffer(shm.buf, dtype=float).reshape(shape)
+    world = FlockWorld(width, height, num_boids)
+    time_scale, turbo = 1.0, False
+    steps = 0
+    next_step = time.perf_counter()
+    last_publish = 0.0
+    try:
+        while True:
+            # Apply everything the UI sent since the last step
+            while True:
+                try:
+                    command = commands.get_nowait()
+                except queue.Empty:
+                    break
+                if command[0] == "stop":
+                    return
+                elif command[0] == "speed":
+                    time_scale, turbo = command[1:]
+                else:
+                    world.apply(command)
+
+            now = time.perf_counter()
+            if not turbo:
+                # Fixed timestep: wait until the next step is due. Sleeping in short slices keeps commands responsive
+                if now < next_step:
+                    time.sleep(min(next_step - now, 0.002))
+                    continue
+                next_step = max(next_step + 1.0 / (step_hz * time_scale), now - max_lag)   # Never owe more than max_lag of real time
+
+            world.step()
+            steps += 1
+
+            # The viewer draws at most about 60 frames per second, so turbo steps are published at twice that
+            if not turbo or now - last_publish >= 1 / 120:
+                last_publish = now
+                state = world.state()[:shape[1] - 1]
+                back = 1 - published.value   # Only this process changes the index, so reading it without the lock is safe
+                slots[back, 0, :2] = len(state), steps
+                slots[back, 1:len(state) + 1] = state
+                with published.get_lock():
+                    published.value = back
+    finally:
+        slots = None
+        shm.close()
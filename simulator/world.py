@@ -0,0 +1,115 @@
+import numpy as np
+from pygame import Vector2
+from sim_flock import Flock
+from obstacles import ObstacleManager
+from spatial_hash import SpatialHash
+from profiler import FrameProfiler
+
+# Columns of the flock state array that the renderer draws and the worker publishes, one row per boid
+STATE_COLUMNS = ("x", "y", "vx", "vy", "size", "r", "g", "b")
+
+class FlockWorld:
+    """Simulation state and physics without any display: boids, obstacles, target and behavior weights.
+    FlockSimulation steps it directly, or a background worker runs its own copy and publishes snapshots"""
+    def __init__(self, width, height, num_boids=100, profiler=None):
+        self.width = width
+        self.height = height
+
+        # Per-phase timers for step(), a disabled profiler when none is given
+        self.profiler = profiler or FrameProfiler()
+
+        # Spatial hash for neighbor queries, rebuilt once per step
+        self.spatial_hash = SpatialHash()
+
+        # Obstacles, with the spatial index and distance field used for avoidance
+        self.obstacle_manager = ObstacleManager(width, height)
+
+        # Settings from the UI, applied on every step
+        self.weights = {"cohesion": 0.5, "alignment": 0.5, "separation": 0.5}   # Behavior weights, as the UI sliders
+        self.num_boids = num_boids    # Flock size the next step adjusts to
+        self.target = None            # Target position for boids to follow, None when target mode is off
+
+        # Initialize boids, kept as flat arrays so a step creates no per-boid objects
+        self.flock = Flock(width, height, num_boids)
+        self.create_boids(num_boids)
+
+    def add_boids(self, count):
+        """Add boids placed randomly in the middle third of the screen, with a random heading and speed as in Boid,
+        and a slightly randomized color for visual interest"""
+        positions = np.random.uniform((self.width / 3, self.height / 3), (2 * self.width / 3, 2 * self.height / 3), (count, 2))
+        angles = np.random.uniform(0, 2 * np.pi, count)
+        speeds = np.random.uniform(2, 4, count)   # Random speed between 2 and 4 for boids to start
+        velocities = np.stack([np.cos(angles) * speeds, np.sin(angles) * speeds], axis=1)
+        colors = np.random.randint(200, 256, (count, 3))
+        self.flock.add(positions, velocities, colors)
+
+    def create_boids(self, num_boids):
+        """Create initial boid population, also used for resetting the simulation.
+        I didn't guarantee that they wouldn't overlap but the collision logic should put them away if they do and probability is low"""
+        self.flock.truncate(0)
+        self.add_boids(num_boids)
+
+    def apply(self, command):
+        """Apply one command tuple from the UI: ("settings", weights, num_boids, target), ("add_obstacle", obstacle), ("remove_all",) or ("reset",)"""
+        name = command[0]
+        if name == "settings":
+            self.weights, self.num_boids, target = command[1:]
+            self.target = None if target is None else Vector2(target)
+        elif name == "add_obstacle":
+            self.obstacle_manager.add_obstacle(command[1])
+        elif name == "remove_all":
+            self.obstacle_manager.remove_all()
+        elif name == "reset":
+            self.create_boids(len(self.flock))
+        else:
+            raise ValueError(f"unknown command {name!r}")
+
+    def positions(self):
+        """(N, 2) array of current boid positions"""
+        return self.flock.positions[:len(self.flock)].copy()
+
+    def state(self):
+        """(N, len(STATE_COLUMNS)) array of every boid's position, velocity, size and color"""
+        flock = self.flock
+        n = len(flock)
+        state = np.empty((n, len(STATE_COLUMNS)))
+        state[:, 0:2] = flock.positions[:n]
+        state[:, 2:4] = flock.velocities[:n]
+        state[:, 4] = flock.size
+        state[:, 5:] = flock.colors[:n]
+        return state
+
+    def step(self):
+        """Advance the simulation by one physics step"""
+        weights = self.weights
+
+        # Check if number of boids needs to be adjusted
+        self.profiler.start("boid_count")
+        current_boids = len(self.flock)
+        if current_boids < self.num_boids:
+            # Add more boids
+            self.add_boids(self.num_boids - current_boids)
+        elif current_boids > self.num_boids:
+            # Remove excess boids
+            self.flock.truncate(self.num_boids)
+        self.profiler.stop("boid_count")
+
+        # Find every boid's neighbors in one spatial hash pass, shared by alignment, cohesion and separation.
+        # Every boid sees the flock as it was at the start of the step (a synchronous update), not partly moved
+        self.profiler.start("neighborhoods")
+        neighborhoods = self.flock.neighborhoods(self.spatial_hash)
+        self.profiler.stop("neighborhoods")
+
+        # Obstacle avoidance reads the distance field, which costs the same per boid however many obstacles there are
+        distance_field = self.obstacle_manager.distance_field if self.obstacle_manager.obstacles else None
+
+        # Apply flocking behaviors with current weights and obstacle avoidance, for the whole flock at once
+        self.profiler.start("apply_behavior")
+        self.flock.apply_behavior(neighborhoods, weights["cohesion"], weights["alignment"], weights["separation"],
+                                  self.target, distance_field)
+        self.profiler.stop("apply_behavior")
+
+        # Update boid positions
+        self.profiler.start("boid_update")
+        self.flock.update()
+        self.profiler.stop("boid_update")